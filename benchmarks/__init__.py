@@ -0,0 +1,9 @@
+"""Benchmarks for the promo engine
+
+Deterministic synthetic weekly data and timings of loading (CSV, Parquet and
+Excel), period sales, analysis, EDLP pricing, Excel export and serial versus
+process-pool batches, reported as JSON. Run ``python -m benchmarks --help``
+from the repository root.
+"""
+from .suite import run_benchmarks
+from .synthetic import generate_weekly_data, synthetic_calendar, synthetic_series
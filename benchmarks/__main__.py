@@ -0,0 +1,45 @@
+"""Command line entry point: python -m benchmarks"""
+import argparse
+import json
+import sys
+
+from .suite import (
+    BENCHMARK_BATCH_SIZES,
+    BENCHMARK_BATCH_WORKERS,
+    BENCHMARK_EXPORT_SIZES,
+    BENCHMARK_REPEATS,
+    BENCHMARK_ROWS,
+    BENCHMARK_SEED,
+    run_benchmarks,
+)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Time the promo engine's hot paths on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=BENCHMARK_ROWS, help="Weekly rows per synthetic dataset (10k to 10M)")
+    parser.add_argument('--export-sizes', type=int, nargs='*', default=BENCHMARK_EXPORT_SIZES, help="Analyses per timed Excel export")
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=BENCHMARK_BATCH_SIZES, help="Promotions per timed batch (serial and process pool)")
+    parser.add_argument('--batch-workers', type=int, nargs='*', default=BENCHMARK_BATCH_WORKERS, help="Process pool sizes to time batches with")
+    parser.add_argument('--repeats', type=int, default=BENCHMARK_REPEATS, help="Timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=BENCHMARK_SEED, help="Seed for the synthetic data")
+    parser.add_argument('--work-dir', help="Directory for temporary data files (default: system temp)")
+    parser.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(
+        args.rows, args.export_sizes, args.repeats, args.seed, args.work_dir,
+        progress=lambda message: print(message, file=sys.stderr),
+        batch_sizes=args.batch_sizes, batch_workers=args.batch_workers
+    )
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+            handle.write('\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
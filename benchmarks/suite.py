@@ -0,0 +1,196 @@
+"""Timed runs of the engine's hot paths over synthetic data"""
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from ppa_engine import (
+    IngestCache,
+    SalesIndex,
+    batch_results_to_analyses,
+    calculate_edlp_spend,
+    export_to_excel,
+    get_period_sales,
+    load_weekly_data,
+    run_analysis,
+    run_promo_batch,
+    run_promo_batch_parallel,
+    write_weekly_store,
+)
+
+from .synthetic import generate_weekly_data, synthetic_calendar
+
+BENCHMARK_ROWS = [10_000, 100_000, 1_000_000]
+BENCHMARK_EXPORT_SIZES = [10, 1_000, 10_000]
+BENCHMARK_BATCH_SIZES = [1_000, 10_000, 50_000]
+BENCHMARK_BATCH_WORKERS = [2, 4]
+BENCHMARK_REPEATS = 3
+# Excel loads are timed on at most this many rows; writing and parsing a
+# workbook near the sheet limit would dominate the whole run
+BENCHMARK_EXCEL_MAX_ROWS = 100_000
+BENCHMARK_SEED = 0
+
+def _versions():
+    versions = {}
+    for package in ('numpy', 'pandas', 'pyarrow', 'openpyxl'):
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def _time(run, repeats):
+    """Seconds for each of repeats calls of run(repeat)"""
+    seconds = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        run(repeat)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def _result(name, seconds, **context):
+    return {
+        'benchmark': name,
+        **context,
+        'best_s': min(seconds),
+        'median_s': statistics.median(seconds),
+        'runs_s': seconds
+    }
+
+def benchmark_dataset(rows, repeats=BENCHMARK_REPEATS, seed=BENCHMARK_SEED, work_dir=None):
+    """Time loading, period sales, analysis and EDLP spend on one synthetic dataset"""
+    results = []
+    weekly = generate_weekly_data(rows, seed)
+    promotions = synthetic_calendar(weekly, repeats, seed)
+    # Each repeat prices a different window, so per-index memos never answer
+    windows = list(zip(promotions['Retailer'], promotions['Product Group(s)'], promotions['Promo Start'], promotions['Promo End']))
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        tmp = Path(tmp)
+        for suffix in ('csv', 'parquet', 'xlsx'):
+            path = tmp / f'weekly.{suffix}'
+            file_rows = rows
+            if suffix == 'csv':
+                weekly.to_csv(path, index=False)
+            elif suffix == 'parquet':
+                weekly.to_parquet(path, index=False)
+            else:
+                file_rows = min(rows, BENCHMARK_EXCEL_MAX_ROWS)
+                weekly.head(file_rows).to_excel(path, index=False)
+            # A fresh cache per repeat, so every call parses the file
+            seconds = _time(
+                lambda repeat: load_weekly_data(path, IngestCache(tmp / f'cache-{suffix}-{repeat}', 1, 1)),
+                repeats
+            )
+            results.append(_result('load_weekly_data', seconds, rows=file_rows, format=suffix))
+        df = load_weekly_data(tmp / 'weekly.parquet', IngestCache(tmp / 'cache', 1, 1))
+
+    seconds = _time(lambda repeat: SalesIndex.from_frame(df), repeats)
+    results.append(_result('SalesIndex.from_frame', seconds, rows=rows))
+    sales_index = SalesIndex.from_frame(df)
+
+    def period_sales(repeat):
+        retailer, groups, start, end = windows[repeat]
+        get_period_sales(df, retailer, groups, start, end, (end - start).days + 1)
+    results.append(_result('get_period_sales', _time(period_sales, repeats), rows=rows))
+
+    def index_period_sales(repeat):
+        retailer, groups, start, end = windows[repeat]
+        sales_index.period_sales(retailer, groups, start, end)
+    results.append(_result('SalesIndex.period_sales', _time(index_period_sales, repeats), rows=rows))
+
+    def analysis(repeat):
+        retailer, groups, start, end = windows[repeat]
+        run_analysis(sales_index, retailer, groups, start, end, 5000.0, 0.0, 30.0)
+    results.append(_result('run_analysis', _time(analysis, repeats), rows=rows))
+
+    # Same windows again with new financial inputs: served from the memos
+    def analysis_rerun(repeat):
+        retailer, groups, start, end = windows[repeat]
+        run_analysis(sales_index, retailer, groups, start, end, 7500.0, 250.0, 35.0)
+    results.append(_result('run_analysis (financial change)', _time(analysis_rerun, repeats), rows=rows))
+
+    # A fresh index so the EDLP memo is cold
+    edlp_index = SalesIndex.from_frame(df)
+    def edlp_spend(repeat):
+        retailer, groups, start, end = windows[repeat]
+        calculate_edlp_spend(edlp_index, retailer, groups, start, end)
+    results.append(_result('calculate_edlp_spend', _time(edlp_spend, repeats), rows=rows))
+    return results, weekly, sales_index
+
+def benchmark_exports(weekly, sales_index, sizes=BENCHMARK_EXPORT_SIZES, repeats=BENCHMARK_REPEATS, seed=BENCHMARK_SEED):
+    """Time export_to_excel over synthetic analyses of each size"""
+    calendar = synthetic_calendar(weekly, max(sizes), seed)
+    analyses = batch_results_to_analyses(run_promo_batch(sales_index, calendar), analysis_date='2024-01-01 00:00:00')
+    for analysis in analyses:
+        analysis['notes'] = ''
+    results = []
+    for size in sizes:
+        seconds = _time(lambda repeat: export_to_excel(analyses[:size]), repeats)
+        results.append(_result('export_to_excel', seconds, analyses=min(size, len(analyses))))
+    return results
+
+def benchmark_batches(weekly, sales_index, sizes=BENCHMARK_BATCH_SIZES, workers=BENCHMARK_BATCH_WORKERS,
+                      repeats=BENCHMARK_REPEATS, seed=BENCHMARK_SEED, work_dir=None):
+    """Time run_promo_batch on a warm index against the process pool at each worker count
+
+    The first batch at each worker count is reported on its own, since it
+    pays for process startup and worker indexing; later batches reuse the
+    pool and the workers' indexes.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        store_dir = Path(tmp) / 'store'
+        write_weekly_store(weekly, store_dir)
+        for size in sizes:
+            calendar = synthetic_calendar(weekly, size, seed)
+            seconds = _time(lambda repeat: run_promo_batch(sales_index, calendar), repeats)
+            results.append(_result('run_promo_batch', seconds, rows=len(weekly), promotions=size))
+            for count in workers:
+                if size == sizes[0]:
+                    first = _time(lambda repeat: run_promo_batch_parallel(store_dir, calendar, count), 1)
+                    results.append(_result('run_promo_batch_parallel (first batch)', first, rows=len(weekly), promotions=size, workers=count))
+                seconds = _time(lambda repeat: run_promo_batch_parallel(store_dir, calendar, count), repeats)
+                results.append(_result('run_promo_batch_parallel', seconds, rows=len(weekly), promotions=size, workers=count))
+    return results
+
+def run_benchmarks(rows=BENCHMARK_ROWS, export_sizes=BENCHMARK_EXPORT_SIZES, repeats=BENCHMARK_REPEATS,
+                   seed=BENCHMARK_SEED, work_dir=None, progress=None, batch_sizes=BENCHMARK_BATCH_SIZES,
+                   batch_workers=BENCHMARK_BATCH_WORKERS):
+    """Run every benchmark and return a JSON-ready report
+
+    Exports are timed on the smallest dataset, since their cost depends on
+    the number of analyses rather than on the weekly rows. Batches are
+    timed on the largest.
+    """
+    results = []
+    export_data = None
+    batch_data = None
+    for count in sorted(rows):
+        if progress:
+            progress(f"dataset: {count:,} rows")
+        dataset_results, weekly, sales_index = benchmark_dataset(count, repeats, seed, work_dir)
+        results += dataset_results
+        if export_data is None:
+            export_data = (weekly, sales_index)
+        batch_data = (weekly, sales_index)
+    if export_sizes and export_data is not None:
+        if progress:
+            progress(f"exports: {', '.join(f'{size:,}' for size in export_sizes)} analyses")
+        results += benchmark_exports(*export_data, export_sizes, repeats, seed)
+    if batch_sizes and batch_data is not None:
+        if progress:
+            progress(f"batches: {', '.join(f'{size:,}' for size in batch_sizes)} promotions")
+        results += benchmark_batches(*batch_data, batch_sizes, batch_workers, repeats, seed, work_dir)
+    return {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'packages': _versions(),
+        'seed': seed,
+        'repeats': repeats,
+        'results': results
+    }
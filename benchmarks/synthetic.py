@@ -0,0 +1,86 @@
+"""Deterministic synthetic syndicated weekly sales data"""
+import numpy as np
+import pandas as pd
+
+from ppa_engine import load_edlp_rates, normalize_promo_calendar
+
+SYNTHETIC_WEEKS = 156
+SYNTHETIC_FIRST_WEEK = '2022-01-08'
+# Every series runs a PROMO_WEEKS-long promotion each PROMO_EVERY_WEEKS
+PROMO_EVERY_WEEKS = 13
+PROMO_WEEKS = 2
+PROMO_LIFT = 0.6
+PROMO_DISCOUNT = 0.2
+
+def synthetic_series(retailers=None):
+    """(retailer, product group) pairs shaped like the EDLP rate table's keys
+
+    The rate table's own pairs come first so EDLP pricing is exercised;
+    asking for more retailers adds synthetic ones in the same '... - RMA'
+    form, carrying the product groups of a real retailer.
+    """
+    pairs = load_edlp_rates()[['Retailer', 'Product Group']].drop_duplicates().sort_values(['Retailer', 'Product Group'])
+    groups = pairs.groupby('Retailer', sort=True)['Product Group'].agg(list)
+    retailers = len(groups) if retailers is None else int(retailers)
+    series = []
+    for number in range(retailers):
+        name = groups.index[number] if number < len(groups) else f"SYNTHETIC MARKET {number + 1:03d} DIV - RMA"
+        series += [(name, group) for group in groups.iloc[number % len(groups)]]
+    return series
+
+def generate_weekly_data(rows, seed=0, retailers=None, weeks=SYNTHETIC_WEEKS):
+    """Weekly sales rows (GEOGRAPHY, Product Group, UPC, Week Ending, Dollars, Units)
+
+    With S synthetic_series, row i is week i % weeks of series
+    (i // weeks) % S and UPC i // (weeks * S), so any row count fills whole
+    series week by week and larger counts add UPCs. The same rows and seed always give the
+    same frame. Units carry a per-series level, yearly seasonality, noise
+    and regular promo spikes at a discounted price.
+    """
+    rows = int(rows)
+    series_keys = np.asarray(synthetic_series(retailers), dtype=object)
+    product_groups, group_ids = np.unique(series_keys[:, 1].astype(str), return_inverse=True)
+    series_count = len(series_keys)
+    rng = np.random.default_rng(seed)
+
+    position = np.arange(rows)
+    week = position % weeks
+    series = position // weeks % series_count
+    upc = position // (weeks * series_count)
+
+    level = rng.lognormal(4.5, 0.6, series_count)
+    price = rng.uniform(2.49, 6.99, len(product_groups))
+    phase = rng.integers(0, PROMO_EVERY_WEEKS, series_count)
+    promo = (week + phase[series]) % PROMO_EVERY_WEEKS < PROMO_WEEKS
+    season = 1 + 0.15 * np.sin(2 * np.pi * week / 52)
+    units = np.round(level[series] * season * (1 + PROMO_LIFT * promo) * rng.gamma(20, 1 / 20, rows))
+    group = group_ids[series]
+    dollars = np.round(units * price[group] * (1 - PROMO_DISCOUNT * promo), 2)
+
+    return pd.DataFrame({
+        'GEOGRAPHY': series_keys[series, 0],
+        'Product Group': series_keys[series, 1],
+        'UPC': [f"SYN{number:08d}" for number in upc * series_count + series],
+        'Week Ending': pd.Timestamp(SYNTHETIC_FIRST_WEEK) + pd.to_timedelta(week * 7, unit='D'),
+        'Dollars': dollars,
+        'Units': units
+    })
+
+def synthetic_calendar(weekly, promotions, seed=0):
+    """Normalized promo calendar of single-group promotions on the series in weekly"""
+    rng = np.random.default_rng(seed)
+    series = weekly[['GEOGRAPHY', 'Product Group']].drop_duplicates().to_numpy()
+    first_week = weekly['Week Ending'].min()
+    last_week = weekly['Week Ending'].max()
+    # Leave room for a full pre- and post-period on either side
+    span_weeks = max((last_week - first_week).days // 7 - 8, 1)
+    picks = rng.integers(0, len(series), promotions)
+    starts = first_week + pd.to_timedelta(4 * 7 + 7 * rng.integers(0, span_weeks, promotions) - 6, unit='D')
+    return normalize_promo_calendar(pd.DataFrame({
+        'Retailer': series[picks, 0],
+        'Product Group(s)': series[picks, 1],
+        'Promo Start': starts,
+        'Promo End': starts + pd.to_timedelta(7 * rng.integers(1, 4, promotions) - 1, unit='D'),
+        'Trade Spend': np.round(rng.uniform(500, 20000, promotions), 2),
+        'Expected Lift %': 25.0
+    }))
@@ -0,0 +1,91 @@
+"""Headless post-promo analysis engine
+
+Everything the Streamlit app computes, importable without Streamlit or
+Plotly. Run ``python -m ppa_engine --help`` for the command line interface.
+"""
+from .analysis import run_analysis
+from .analysis_store import (
+    ANALYSIS_DB_PATH,
+    ANALYSIS_PAGE_SIZE,
+    ANALYSIS_SORT_COLUMNS,
+    FISCAL_YEAR_START_MONTH,
+    ROLLUP_LEVELS,
+    AnalysisStore,
+    fiscal_period,
+    get_analysis_store,
+)
+from .baselines import (
+    BASELINE_METHODS,
+    BASELINE_WEEKS,
+    DEFAULT_BASELINE,
+    SalesBaselines,
+    rolling_baseline,
+    weekly_matrix,
+)
+from .batch import (
+    BATCH_PARALLEL_MIN_ROWS,
+    CALENDAR_OPTIONAL_COLUMNS,
+    CALENDAR_REQUIRED_COLUMNS,
+    batch_results_to_analyses,
+    normalize_promo_calendar,
+    read_promo_calendar,
+    run_promo_batch,
+    run_promo_batch_parallel,
+)
+from .cube import SalesCube
+from .detect import (
+    DETECT_BASELINE_WEEKS,
+    DETECT_MIN_LIFT_PCT,
+    detect_promo_windows,
+    detections_to_calendar,
+)
+from .edlp import (
+    EDLP_RATES_PATH,
+    calculate_edlp_spend,
+    current_edlp_rates,
+    edlp_spend_windows,
+    get_edlp_rate,
+    load_edlp_rates,
+    read_edlp_rates,
+)
+from .export import (
+    COLUMNAR_FORMATS,
+    EXPORT_DETAIL_CHUNK,
+    analyses_to_frame,
+    export_columnar,
+    export_to_excel,
+    weekly_detail,
+    write_columnar_export,
+    write_table,
+)
+from .ingest import (
+    ENGINE_COLUMNS,
+    IngestCache,
+    append_weekly_data,
+    compact_weekly_data,
+    content_key,
+    get_ingest_cache,
+    ingest_weekly_data,
+    load_weekly_data,
+    memory_report,
+    parse_weekly_data,
+    read_weekly_csv,
+    read_weekly_parquet,
+)
+from .metrics import calculate_metrics, sensitivity_grid
+from .sales import (
+    SalesIndex,
+    calculate_promo_periods,
+    get_period_sales,
+    get_sales_index,
+    get_windows_sales,
+    prorate_weeks,
+)
+from .store import (
+    derive_weekly_store,
+    read_store_manifest,
+    read_weekly_partition,
+    read_weekly_store,
+    write_weekly_store,
+)
+from .uncertainty import BOOTSTRAP_DRAWS, CONFIDENCE_LEVEL, bootstrap_intervals, non_promo_weeks
@@ -0,0 +1,65 @@
+"""Single-promotion analysis"""
+import math
+
+from .baselines import BASELINE_METHODS, BASELINE_WEEKS, DEFAULT_BASELINE
+from .edlp import calculate_edlp_spend
+from .metrics import calculate_metrics
+from .sales import calculate_promo_periods
+from .uncertainty import bootstrap_intervals
+
+def run_analysis(sales_index, retailer, product_groups, promo_start, promo_end, trade_spend, flat_fee, gross_margin_pct, expected_lift=0.0, expected_roi=0.0,
+                 baseline=DEFAULT_BASELINE, baseline_weeks=BASELINE_WEEKS, bootstrap_draws=0):
+    """Analyze one promotion and return it as an analysis record
+    
+    pre_sales and pre_units hold the chosen baseline; for the default
+    pre_period baseline that is the pre-period itself. With bootstrap_draws
+    the record also carries confidence intervals (None if history is short).
+    """
+    if isinstance(product_groups, str):
+        product_groups = [product_groups]
+    
+    periods = calculate_promo_periods(promo_start, promo_end)
+    
+    (pre_sales, pre_units), (promo_sales, promo_units), (post_sales, post_units) = sales_index.window_sales(
+        retailer, product_groups, [
+            (periods['pre_start'], periods['pre_end']),
+            (periods['promo_start'], periods['promo_end']),
+            (periods['post_start'], periods['post_end'])
+        ]
+    )
+    
+    if baseline != 'pre_period':
+        (pre_sales,), (pre_units,) = sales_index.baselines().baseline_sales(
+            retailer, product_groups, [periods['promo_start']], [periods['promo_end']], baseline, baseline_weeks
+        )
+        if math.isnan(pre_units):
+            raise ValueError(f"Not enough sales history for the {BASELINE_METHODS[baseline].lower()} baseline")
+        pre_sales, pre_units = float(pre_sales), float(pre_units)
+    
+    # Calculate EDLP spend for promo period
+    edlp_spend = calculate_edlp_spend(sales_index, retailer, product_groups, periods['promo_start'], periods['promo_end'])
+    
+    metrics = calculate_metrics(pre_sales, promo_sales, post_sales, trade_spend, flat_fee, pre_units, promo_units, post_units, gross_margin_pct, edlp_spend)
+    
+    analysis = {
+        'retailer': retailer,
+        'product_group': product_groups,
+        'product_group_display': ', '.join(product_groups),
+        'periods': periods,
+        'pre_sales': pre_sales,
+        'promo_sales': promo_sales,
+        'post_sales': post_sales,
+        'pre_units': pre_units,
+        'promo_units': promo_units,
+        'post_units': post_units,
+        'trade_spend': trade_spend,
+        'flat_fee': flat_fee,
+        'gross_margin_pct': gross_margin_pct,
+        'expected_lift': expected_lift,
+        'expected_roi': expected_roi,
+        'baseline': baseline,
+        'metrics': metrics
+    }
+    if bootstrap_draws:
+        analysis['intervals'] = bootstrap_intervals(sales_index, analysis, bootstrap_draws)
+    return analysis
@@ -0,0 +1,391 @@
+"""SQLite store for saved analyses"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# ANALYSIS STORE - Saved analyses shared by every session on this server
+# ============================================================================
+# One SQLite file holds every saved analysis: indexed columns for filtering
+# and sorting plus the full analysis record as JSON. Set PPA_ANALYSIS_DB to
+# move it (e.g. onto a shared drive).
+#
+# A portfolio rollup table keeps spend, incremental sales/profit and lift/ROI
+# totals per (retailer, product groups, fiscal quarter), adjusted in the same
+# transaction as every save and delete. Fiscal years start in
+# PPA_FISCAL_YEAR_START_MONTH (default 1 = January) and are named for the
+# calendar year they end in. Metrics an analysis could not compute (NaN,
+# e.g. from a blank Dollars week) stay NULL on the analysis, add 0 to the
+# rollup totals and are left out of its lift and ROI averages.
+# ============================================================================
+ANALYSIS_DB_PATH = Path(os.environ.get('PPA_ANALYSIS_DB', Path.home() / '.local' / 'share' / 'ppa_sl_ux' / 'analyses.sqlite'))
+ANALYSIS_PAGE_SIZE = 25
+FISCAL_YEAR_START_MONTH = int(os.environ.get('PPA_FISCAL_YEAR_START_MONTH', 1))
+
+# Rollup dimensions, by their display name
+ROLLUP_LEVELS = {
+    'Retailer': 'retailer',
+    'Product Group(s)': 'product_groups',
+    'Fiscal Quarter': 'fiscal_period'
+}
+
+# Columns a query can sort on, by their display name
+ANALYSIS_SORT_COLUMNS = {
+    'Promo Start': 'promo_start',
+    'Promo End': 'promo_end',
+    'Retailer': 'retailer',
+    'Product Group(s)': 'product_groups',
+    'Analysis Date': 'analysis_date',
+    'During Lift %': 'during_lift',
+    'Post Lift %': 'post_lift',
+    'ROI %': 'roi',
+    'Total Spend': 'total_spend',
+    'Incremental Sales': 'incremental_sales',
+    'Incremental Profit': 'incremental_profit'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    retailer TEXT NOT NULL,
+    product_groups TEXT NOT NULL,
+    promo_start TEXT NOT NULL,
+    promo_end TEXT NOT NULL,
+    analysis_date TEXT,
+    during_lift REAL,
+    post_lift REAL,
+    roi REAL,
+    total_spend REAL,
+    incremental_sales REAL,
+    incremental_profit REAL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analysis_product_groups (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    product_group TEXT NOT NULL,
+    PRIMARY KEY (product_group, analysis_id)
+);
+CREATE TABLE IF NOT EXISTS portfolio_rollup (
+    retailer TEXT NOT NULL,
+    product_groups TEXT NOT NULL,
+    fiscal_period TEXT NOT NULL,
+    analyses INTEGER NOT NULL,
+    total_spend REAL NOT NULL,
+    incremental_sales REAL NOT NULL,
+    incremental_profit REAL NOT NULL,
+    lift_sum REAL NOT NULL,
+    lift_count INTEGER NOT NULL,
+    roi_sum REAL NOT NULL,
+    roi_count INTEGER NOT NULL,
+    PRIMARY KEY (retailer, product_groups, fiscal_period)
+);
+CREATE TABLE IF NOT EXISTS store_settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_retailer ON analyses (retailer, promo_start);
+CREATE INDEX IF NOT EXISTS analyses_dates ON analyses (promo_start, promo_end);
+CREATE INDEX IF NOT EXISTS analysis_product_groups_id ON analysis_product_groups (analysis_id);
+"""
+
+def _to_json(value):
+    """json.dumps fallback for dates and NumPy scalars in analysis records"""
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in an analysis record")
+
+def _from_record(record_json, analysis_id):
+    analysis = json.loads(record_json)
+    analysis['periods'] = {
+        name: (value if name == 'promo_days' else pd.Timestamp(value))
+        for name, value in analysis['periods'].items()
+    }
+    if analysis.get('intervals'):
+        for name in ('during_lift', 'post_lift', 'roi'):
+            analysis['intervals'][name] = tuple(analysis['intervals'][name])
+    analysis['id'] = analysis_id
+    return analysis
+
+_ROLLUP_UPSERT = """
+INSERT INTO portfolio_rollup VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (retailer, product_groups, fiscal_period) DO UPDATE SET
+    analyses = analyses + excluded.analyses,
+    total_spend = total_spend + excluded.total_spend,
+    incremental_sales = incremental_sales + excluded.incremental_sales,
+    incremental_profit = incremental_profit + excluded.incremental_profit,
+    lift_sum = lift_sum + excluded.lift_sum,
+    lift_count = lift_count + excluded.lift_count,
+    roi_sum = roi_sum + excluded.roi_sum,
+    roi_count = roi_count + excluded.roi_count
+"""
+_ROLLUP_SOURCE_COLUMNS = 'retailer, product_groups, promo_start, total_spend, incremental_sales, incremental_profit, during_lift, roi'
+
+def _day(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def fiscal_period(date, start_month=FISCAL_YEAR_START_MONTH):
+    """Fiscal quarter label of a date, e.g. 'FY2024 Q3'"""
+    date = pd.Timestamp(date)
+    quarter = (date.month - start_month) % 12 // 3 + 1
+    year = date.year + (start_month != 1 and date.month >= start_month)
+    return f"FY{year} Q{quarter}"
+
+def _is_missing(value):
+    return value is None or np.isnan(value)
+
+def _rollup_value(value):
+    """A metric as it counts toward the rollup totals; NaN (stored as NULL) adds 0"""
+    return 0.0 if _is_missing(value) else value
+
+def _rollup_delta(row, sign=1):
+    """portfolio_rollup values for one analyses row (columns as _ROLLUP_SOURCE_COLUMNS)
+
+    Lift and ROI are averaged over the analyses that have them, like
+    summary()'s AVG, so each carries its own count.
+    """
+    retailer, product_groups, promo_start, total_spend, incremental_sales, incremental_profit, during_lift, roi = row
+    return (
+        retailer, product_groups, fiscal_period(promo_start), sign,
+        sign * _rollup_value(total_spend), sign * _rollup_value(incremental_sales), sign * _rollup_value(incremental_profit),
+        sign * _rollup_value(during_lift), sign * (not _is_missing(during_lift)),
+        sign * _rollup_value(roi), sign * (not _is_missing(roi))
+    )
+
+class AnalysisStore:
+    """Saved analyses in a SQLite file, with filtered and paginated queries
+
+    Every call opens its own connection, so one store can be shared across
+    Streamlit sessions and threads.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            fiscal_start = conn.execute("SELECT value FROM store_settings WHERE name = 'fiscal_year_start_month'").fetchone()
+        # Stores from before the rollup, or cut to another fiscal calendar
+        if fiscal_start is None or int(fiscal_start[0]) != FISCAL_YEAR_START_MONTH:
+            self.rebuild_rollup()
+
+    def rebuild_rollup(self):
+        """Recompute the portfolio rollup from every saved analysis"""
+        with self._lock, self._connect() as conn:
+            conn.execute('DELETE FROM portfolio_rollup')
+            rows = conn.execute(f'SELECT {_ROLLUP_SOURCE_COLUMNS} FROM analyses').fetchall()
+            conn.executemany(_ROLLUP_UPSERT, [_rollup_delta(row) for row in rows])
+            conn.execute(
+                "INSERT OR REPLACE INTO store_settings VALUES ('fiscal_year_start_month', ?)",
+                (str(FISCAL_YEAR_START_MONTH),)
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA foreign_keys=ON')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(analysis):
+        groups = analysis['product_group']
+        groups = [groups] if isinstance(groups, str) else list(groups)
+        metrics = analysis['metrics']
+        values = (
+            analysis['retailer'],
+            ', '.join(groups),
+            _day(analysis['periods']['promo_start']),
+            _day(analysis['periods']['promo_end']),
+            analysis.get('analysis_date'),
+            float(metrics['during_lift']),
+            float(metrics['post_lift']),
+            float(metrics['roi']),
+            float(analysis['trade_spend'] + analysis['flat_fee'] + metrics['edlp_spend']),
+            float(metrics['incremental_sales']),
+            float(metrics['incremental_profit']),
+            json.dumps({key: value for key, value in analysis.items() if key != 'id'}, default=_to_json)
+        )
+        return values, groups
+
+    def save_many(self, analyses):
+        """Save analyses in one transaction and return their new ids"""
+        ids = []
+        with self._lock, self._connect() as conn:
+            for analysis in analyses:
+                values, groups = self._row(analysis)
+                cursor = conn.execute(
+                    'INSERT INTO analyses (retailer, product_groups, promo_start, promo_end, analysis_date, '
+                    'during_lift, post_lift, roi, total_spend, incremental_sales, incremental_profit, record) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    values
+                )
+                ids.append(cursor.lastrowid)
+                conn.executemany(
+                    'INSERT OR IGNORE INTO analysis_product_groups (analysis_id, product_group) VALUES (?, ?)',
+                    [(cursor.lastrowid, group) for group in groups]
+                )
+                conn.execute(_ROLLUP_UPSERT, _rollup_delta(values[:3] + values[8:11] + values[5:6] + values[7:8]))
+        return ids
+
+    def save(self, analysis):
+        """Save one analysis and return its id"""
+        return self.save_many([analysis])[0]
+
+    def delete(self, analysis_id):
+        """Delete an analysis; returns False if it did not exist"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f'SELECT {_ROLLUP_SOURCE_COLUMNS} FROM analyses WHERE id = ?', (int(analysis_id),)).fetchone()
+            if row is None:
+                return False
+            conn.execute('DELETE FROM analyses WHERE id = ?', (int(analysis_id),))
+            conn.execute(_ROLLUP_UPSERT, _rollup_delta(row, -1))
+            conn.execute('DELETE FROM portfolio_rollup WHERE analyses <= 0')
+            return True
+
+    def get(self, analysis_id):
+        """One analysis record by id, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT id, record FROM analyses WHERE id = ?', (int(analysis_id),)).fetchone()
+        return _from_record(row[1], row[0]) if row else None
+
+    @staticmethod
+    def _where(retailer=None, product_group=None, start=None, end=None, search=None):
+        clauses, params = [], []
+        if retailer:
+            clauses.append('retailer = ?')
+            params.append(retailer)
+        if product_group:
+            clauses.append('id IN (SELECT analysis_id FROM analysis_product_groups WHERE product_group = ?)')
+            params.append(product_group)
+        # Promos overlapping start..end
+        if start is not None:
+            clauses.append('promo_end >= ?')
+            params.append(_day(start))
+        if end is not None:
+            clauses.append('promo_start <= ?')
+            params.append(_day(end))
+        if search:
+            clauses.append("(retailer LIKE ? ESCAPE '\\' OR product_groups LIKE ? ESCAPE '\\')")
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params.extend([pattern, pattern])
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def count(self, **filters):
+        """Number of analyses matching the filters"""
+        where, params = self._where(**filters)
+        with self._connect() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM analyses{where}', params).fetchone()[0]
+
+    def _select(self, columns, limit, offset, sort, descending, filters):
+        where, params = self._where(**filters)
+        direction = 'DESC' if descending else 'ASC'
+        order = f'{ANALYSIS_SORT_COLUMNS[sort]} {direction}, id {direction}'
+        page = ' LIMIT ? OFFSET ?' if limit is not None else ''
+        page_params = [int(limit), int(offset)] if limit is not None else []
+        with self._connect() as conn:
+            return conn.execute(f'SELECT {columns} FROM analyses{where} ORDER BY {order}{page}', params + page_params).fetchall()
+
+    def query(self, limit=None, offset=0, sort='Promo Start', descending=True, **filters):
+        """Full analysis records matching the filters, one page at a time"""
+        rows = self._select('id, record', limit, offset, sort, descending, filters)
+        return [_from_record(record, analysis_id) for analysis_id, record in rows]
+
+    def table(self, limit=None, offset=0, sort='Promo Start', descending=True, **filters):
+        """One page of matching analyses as a frame of the indexed columns, by id"""
+        columns = ['id'] + list(ANALYSIS_SORT_COLUMNS.values())
+        rows = self._select(', '.join(columns), limit, offset, sort, descending, filters)
+        table = pd.DataFrame(rows, columns=['id'] + list(ANALYSIS_SORT_COLUMNS)).set_index('id')
+        table['Promo Start'] = pd.to_datetime(table['Promo Start'])
+        table['Promo End'] = pd.to_datetime(table['Promo End'])
+        return table
+
+    def summary(self, **filters):
+        """Average lift and ROI, total spend and incremental sales over matching analyses"""
+        where, params = self._where(**filters)
+        with self._connect() as conn:
+            count, avg_lift, avg_roi, total_spend, total_incremental = conn.execute(
+                'SELECT COUNT(*), AVG(during_lift), AVG(roi), SUM(total_spend), SUM(incremental_sales) '
+                f'FROM analyses{where}', params
+            ).fetchone()
+        return {
+            'count': count,
+            'avg_lift': avg_lift or 0.0,
+            'avg_roi': avg_roi or 0.0,
+            'total_spend': total_spend or 0.0,
+            'total_incremental': total_incremental or 0.0
+        }
+
+    @staticmethod
+    def _rollup_where(retailer=None, product_groups=None, fiscal_period=None):
+        clauses, params = [], []
+        for column, value in (('retailer', retailer), ('product_groups', product_groups), ('fiscal_period', fiscal_period)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def rollup(self, group_by, **drill):
+        """Portfolio totals grouped by ROLLUP_LEVELS names, within drill (retailer=, product_groups=, fiscal_period=)
+
+        ROI % is the pooled return on all spend in a cell; Avg Lift % and
+        Avg ROI % average the individual analyses that have them (NaN if
+        none do).
+        """
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        keys = [ROLLUP_LEVELS[level] for level in group_by]
+        where, params = self._rollup_where(**drill)
+        select = ', '.join(keys + [
+            'SUM(analyses)', 'SUM(total_spend)', 'SUM(incremental_sales)', 'SUM(incremental_profit)',
+            'SUM(lift_sum)', 'SUM(lift_count)', 'SUM(roi_sum)', 'SUM(roi_count)'
+        ])
+        group = f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}" if keys else ''
+        with self._connect() as conn:
+            rows = conn.execute(f'SELECT {select} FROM portfolio_rollup{where}{group}', params).fetchall()
+        rollup = pd.DataFrame(rows, columns=group_by + [
+            'Analyses', 'Total Spend', 'Incremental Sales', 'Incremental Profit', 'lift_sum', 'lift_count', 'roi_sum', 'roi_count'
+        ])
+        rollup = rollup[rollup['Analyses'] > 0]
+        spend = rollup['Total Spend'].to_numpy(dtype='float64')
+        roi = np.zeros(len(rollup))
+        np.divide(rollup['Incremental Profit'] - spend, spend, out=roi, where=spend > 0)
+        rollup['ROI %'] = roi * 100
+        rollup['Avg Lift %'] = rollup.pop('lift_sum') / rollup.pop('lift_count').where(lambda count: count > 0)
+        rollup['Avg ROI %'] = rollup.pop('roi_sum') / rollup.pop('roi_count').where(lambda count: count > 0)
+        return rollup.reset_index(drop=True)
+
+    def rollup_values(self, level, **drill):
+        """Distinct values of one rollup level (a ROLLUP_LEVELS name) within a drill-down"""
+        column = ROLLUP_LEVELS[level]
+        where, params = self._rollup_where(**drill)
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(f'SELECT DISTINCT {column} FROM portfolio_rollup{where} ORDER BY {column}', params)]
+
+    def retailers(self):
+        """Retailers with at least one saved analysis"""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT retailer FROM analyses ORDER BY retailer')]
+
+    def product_groups(self):
+        """Product groups with at least one saved analysis"""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT product_group FROM analysis_product_groups ORDER BY product_group')]
+
+@lru_cache(maxsize=None)
+def get_analysis_store(path=None):
+    """Process-wide analysis store at path (default ANALYSIS_DB_PATH)"""
+    return AnalysisStore(path or ANALYSIS_DB_PATH)
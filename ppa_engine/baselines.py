@@ -0,0 +1,214 @@
+"""Baseline models: expected sales for a promo window had there been no promo"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .cube import _to_days
+
+BASELINE_METHODS = {
+    'pre_period': "Pre-period (same length, just before)",
+    'trailing_median': "Trailing N-week median",
+    'prior_year': "Same window prior year",
+    'seasonal': "Seasonality-adjusted average"
+}
+DEFAULT_BASELINE = 'pre_period'
+BASELINE_WEEKS = 8
+# Fewest observed weeks a trailing median may be taken over
+MIN_BASELINE_WEEKS = 4
+# Weeks of recent history the seasonality-adjusted average starts from
+SEASONAL_WEEKS = 13
+# 52 weeks back, so prior-year windows keep their weekdays
+PRIOR_YEAR_DAYS = 364
+COMBINED_MEDIAN_CACHE_ENTRIES = 256
+
+def weekly_matrix(sales_index, column='units'):
+    """Weekly totals per (retailer, product group) as a series x weeks matrix
+
+    Columns are consecutive 7-day slots, so every series advances one column
+    per week whatever weekday its weeks end on (Saturday and Sunday feeds
+    share columns instead of alternating). Rows sum every UPC of a series
+    into its Week Ending. Weeks a series has no data for, or a blank value
+    in, are NaN and left out of rolling medians.
+    Returns (keys, week_axis, matrix); week_axis[i, j] is series i's Week
+    Ending for column j, increasing along each row.
+    """
+    keys = list(sales_index.series)
+    if not keys:
+        return keys, np.empty((0, 0), dtype='datetime64[ns]'), np.empty((0, 0))
+    entries = [sales_index.series[key] for key in keys]
+    weeks = np.concatenate([entry['weeks'] for entry in entries])
+    days = weeks.astype('datetime64[D]').view('int64')
+    values = np.concatenate([entry[column] for entry in entries])
+    series_ids = np.repeat(np.arange(len(keys)), [len(entry['weeks']) for entry in entries])
+
+    slots = days // 7
+    first_slot = slots.min() if len(slots) else 0
+    week_count = int(slots.max() - first_slot + 1) if len(slots) else 0
+    cells = series_ids * week_count + (slots - first_slot)
+    size = len(keys) * week_count
+    matrix = np.bincount(cells, weights=np.nan_to_num(values), minlength=size)
+    blank = np.bincount(cells, weights=np.isnan(values), minlength=size) > 0
+    matrix[(np.bincount(cells, minlength=size) == 0) | blank] = np.nan
+
+    # Each series' weekday (from its latest week) dates the weeks it has no data for
+    weekday = np.zeros(len(keys), dtype='int64')
+    if len(days):
+        weekday[series_ids] = days % 7
+    week_days = (first_slot + np.arange(week_count)) * 7 + weekday[:, None]
+    week_days.ravel()[cells] = days
+    week_axis = week_days.astype('datetime64[D]').astype('datetime64[ns]')
+    return keys, week_axis, matrix.reshape(len(keys), week_count)
+
+def rolling_baseline(matrix, baseline_weeks=BASELINE_WEEKS, min_baseline_weeks=MIN_BASELINE_WEEKS):
+    """Median of each week's trailing baseline_weeks (excluding the week itself)"""
+    series_count, week_count = matrix.shape
+    padded = np.concatenate([np.full((series_count, baseline_weeks), np.nan), matrix], axis=1)
+    windows = sliding_window_view(padded[:, :week_count + baseline_weeks - 1], baseline_weeks, axis=1)
+    observed = np.count_nonzero(~np.isnan(windows), axis=2)
+    baseline = np.full((series_count, week_count), np.nan)
+    enough = observed >= min_baseline_weeks
+    if enough.any():
+        baseline[enough] = np.nanmedian(windows[enough], axis=1)
+    return baseline
+
+class SalesBaselines:
+    """Baseline inputs for every series of a SalesIndex, computed once
+
+    Windowed averages come from the index's prefix-sum cube. Trailing
+    medians are precomputed for every series on first use of a given
+    window length; multi-group selections are combined and cached on
+    demand. Switching methods never re-reads the weekly data.
+    """
+
+    def __init__(self, sales_index):
+        self.cube = sales_index.cube()
+        keys, self.week_axis, self.dollars = weekly_matrix(sales_index, 'dollars')
+        _, _, self.units = weekly_matrix(sales_index, 'units')
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.first_day = {
+            key: _to_days(entry['weeks'][:1])[0] - 6
+            for key, entry in sales_index.series.items() if len(entry['weeks'])
+        }
+        self._series_medians = {}
+        self._combined_medians = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _medians(self, dollars, units, weeks):
+        # One extra column so promos after the last week still see a baseline
+        stacked = np.vstack([dollars, units])
+        stacked = np.concatenate([stacked, np.full((len(stacked), 1), np.nan)], axis=1)
+        medians = rolling_baseline(stacked, weeks, min(weeks, MIN_BASELINE_WEEKS))
+        return medians[:len(dollars)], medians[len(dollars):]
+
+    def week_endings(self, retailer, product_groups):
+        """Week Ending of each weekly_series column, or None
+
+        Taken from the first product group with data; groups of one retailer
+        share a weekday, so their columns line up.
+        """
+        rows = [self.rows[(retailer, pg)] for pg in dict.fromkeys(product_groups) if (retailer, pg) in self.rows]
+        return self.week_axis[rows[0]] if rows else None
+
+    def weekly_series(self, retailer, product_groups):
+        """Weekly (dollars, units) on week_endings summed over product_groups, or None"""
+        rows = [self.rows[(retailer, pg)] for pg in dict.fromkeys(product_groups) if (retailer, pg) in self.rows]
+        if not rows:
+            return None
+        missing = np.isnan(self.units[rows]).all(axis=0)
+        dollars = np.where(missing, np.nan, np.nansum(self.dollars[rows], axis=0))
+        units = np.where(missing, np.nan, np.nansum(self.units[rows], axis=0))
+        return dollars, units
+
+    def trailing_medians(self, retailer, product_groups, weeks=BASELINE_WEEKS):
+        """Rolling (dollars, units) weekly medians on week_endings plus one week, or None"""
+        rows = [self.rows[(retailer, pg)] for pg in dict.fromkeys(product_groups) if (retailer, pg) in self.rows]
+        if not rows:
+            return None
+        with self._lock:
+            if len(rows) == 1:
+                if weeks not in self._series_medians:
+                    self._series_medians[weeks] = self._medians(self.dollars, self.units, weeks)
+                dollars, units = self._series_medians[weeks]
+                return dollars[rows[0]], units[rows[0]]
+
+            key = (tuple(sorted(rows)), weeks)
+            if key in self._combined_medians:
+                self._combined_medians.move_to_end(key)
+                return self._combined_medians[key]
+        dollars, units = self.weekly_series(retailer, product_groups)
+        (dollars,), (units,) = self._medians(dollars[None], units[None], weeks)
+        with self._lock:
+            self._combined_medians[key] = (dollars, units)
+            if len(self._combined_medians) > COMBINED_MEDIAN_CACHE_ENTRIES:
+                self._combined_medians.popitem(last=False)
+        return dollars, units
+
+    def _history_start(self, retailer, product_groups):
+        days = [self.first_day[(retailer, pg)] for pg in product_groups if (retailer, pg) in self.first_day]
+        return min(days) if days else None
+
+    def _daily_rates(self, retailer, product_groups, starts, ends):
+        dollars, units = self.cube.window_sales_arrays(retailer, product_groups, starts, ends)
+        days = (_to_days(ends) - _to_days(starts) + 1).astype('float64')
+        return dollars / days, units / days
+
+    def baseline_sales(self, retailer, product_groups, starts, ends, method=DEFAULT_BASELINE, weeks=BASELINE_WEEKS):
+        """Baseline (dollars, units) arrays sized to each (starts[i], ends[i]) window
+
+        Windows without enough history for the method are NaN.
+        """
+        if method not in BASELINE_METHODS:
+            raise ValueError(f"Unknown baseline '{method}'. Choose one of: {', '.join(BASELINE_METHODS)}")
+        if isinstance(product_groups, str):
+            product_groups = [product_groups]
+        starts = pd.to_datetime(pd.Series(starts)).reset_index(drop=True)
+        ends = pd.to_datetime(pd.Series(ends)).reset_index(drop=True)
+        promo_days = (_to_days(ends) - _to_days(starts) + 1).astype('float64')
+        one_day = pd.Timedelta(days=1)
+        history_start = self._history_start(retailer, product_groups)
+        if history_start is None:
+            empty = 0.0 if method == 'pre_period' else np.nan
+            return np.full(len(starts), empty), np.full(len(starts), empty)
+
+        if method == 'pre_period':
+            pre_starts = starts - pd.to_timedelta(promo_days, unit='D')
+            dollars, units = self.cube.window_sales_arrays(retailer, product_groups, pre_starts, starts - one_day)
+            # Matches the original analysis: missing pre-period sales count as zero
+            covered = np.ones(len(starts), dtype=bool)
+
+        elif method == 'trailing_median':
+            medians = self.trailing_medians(retailer, product_groups, int(weeks))
+            week_endings = self.week_endings(retailer, product_groups)
+            positions = np.searchsorted(week_endings, starts.to_numpy(dtype='datetime64[ns]'), side='left')
+            dollars = medians[0][positions] * promo_days / 7
+            units = medians[1][positions] * promo_days / 7
+            covered = ~np.isnan(units)
+
+        elif method == 'prior_year':
+            shift = pd.Timedelta(days=PRIOR_YEAR_DAYS)
+            dollars, units = self.cube.window_sales_arrays(retailer, product_groups, starts - shift, ends - shift)
+            covered = _to_days(starts - shift) >= history_start
+
+        else:
+            # Recent daily rate, scaled by how the same window compared with
+            # its own recent history a year earlier
+            recent = pd.Timedelta(weeks=SEASONAL_WEEKS)
+            shift = pd.Timedelta(days=PRIOR_YEAR_DAYS)
+            recent_dollars, recent_units = self._daily_rates(retailer, product_groups, starts - recent, starts - one_day)
+            year_dollars, year_units = self._daily_rates(retailer, product_groups, starts - shift, ends - shift)
+            year_recent_dollars, year_recent_units = self._daily_rates(
+                retailer, product_groups, starts - shift - recent, starts - shift - one_day
+            )
+            has_prior_year = _to_days(starts - shift - recent) >= history_start
+            dollar_index = np.divide(year_dollars, year_recent_dollars, out=np.ones(len(starts)),
+                                     where=has_prior_year & (year_recent_dollars > 0))
+            unit_index = np.divide(year_units, year_recent_units, out=np.ones(len(starts)),
+                                   where=has_prior_year & (year_recent_units > 0))
+            dollars = recent_dollars * dollar_index * promo_days
+            units = recent_units * unit_index * promo_days
+            covered = _to_days(starts - recent) >= history_start
+
+        return np.where(covered, dollars, np.nan), np.where(covered, units, np.nan)
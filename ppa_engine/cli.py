@@ -0,0 +1,94 @@
+"""Command line entry point: python -m ppa_engine"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from .analysis import run_analysis
+from .baselines import BASELINE_METHODS, BASELINE_WEEKS, DEFAULT_BASELINE
+from .batch import BATCH_PARALLEL_MIN_ROWS, batch_results_to_analyses, read_promo_calendar, run_promo_batch, run_promo_batch_parallel
+from .export import export_to_excel, write_columnar_export
+from .ingest import ingest_weekly_data
+from .sales import get_sales_index
+
+def _add_financial_args(parser):
+    parser.add_argument('--trade-spend', type=float, default=0.0, help="Item-level trade spend ($)")
+    parser.add_argument('--flat-fee', type=float, default=0.0, help="Additional fees ($)")
+    parser.add_argument('--gross-margin', type=float, default=30.0, help="Gross margin (%%)")
+    parser.add_argument('--expected-lift', type=float, default=0.0, help="Expected lift (%%)")
+    parser.add_argument('--expected-roi', type=float, default=0.0, help="Expected ROI (%%)")
+
+def _add_baseline_args(parser):
+    parser.add_argument('--baseline', choices=list(BASELINE_METHODS), default=DEFAULT_BASELINE, help="Baseline the lift is measured against")
+    parser.add_argument('--baseline-weeks', type=int, default=BASELINE_WEEKS, help="Weeks in the trailing median baseline")
+
+def _add_ingest_args(parser):
+    parser.add_argument('--only-retailer', action='append', help="Keep only this GEOGRAPHY while loading (repeatable)")
+    parser.add_argument('--only-product-group', action='append', help="Keep only this product group while loading (repeatable)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ppa_engine', description="Post-promo analysis without the Streamlit UI")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="Analyze a single promotion")
+    analyze.add_argument('weekly_data', help="Weekly sales data (Excel, CSV or Parquet)")
+    _add_ingest_args(analyze)
+    analyze.add_argument('--retailer', required=True, help="GEOGRAPHY value")
+    analyze.add_argument('--product-group', action='append', required=True, help="Product group (repeat for several)")
+    analyze.add_argument('--start', required=True, help="Promo start date (YYYY-MM-DD)")
+    analyze.add_argument('--end', required=True, help="Promo end date (YYYY-MM-DD)")
+    _add_financial_args(analyze)
+    _add_baseline_args(analyze)
+    analyze.add_argument('--bootstrap', type=int, default=0, metavar='DRAWS', help="Add bootstrap confidence intervals from this many draws")
+    analyze.add_argument('--output', help="Write an export here instead of printing JSON: .xlsx, .parquet, .csv or .ndjson")
+    analyze.add_argument('--weekly-detail', action='store_true', help="Add the prorated weekly rows to the export")
+
+    batch = commands.add_parser('batch', help="Analyze every promotion in a promo calendar")
+    batch.add_argument('weekly_data', help="Weekly sales data (Excel, CSV or Parquet)")
+    _add_ingest_args(batch)
+    batch.add_argument('calendar', help="Promo calendar (CSV or Excel)")
+    _add_baseline_args(batch)
+    batch.add_argument('--workers', type=int, default=1, help="Worker processes for calendars of %d+ rows" % BATCH_PARALLEL_MIN_ROWS)
+    batch.add_argument('--output', help="Results file: .csv for the results table, .xlsx, .parquet or .ndjson for an analysis export (default: CSV to stdout)")
+    batch.add_argument('--weekly-detail', action='store_true', help="Add the prorated weekly rows to an analysis export")
+    return parser
+
+def _write_analyses(analyses, output, sales_index=None):
+    if Path(output).suffix.lower() in ('.xlsx', '.xls'):
+        Path(output).write_bytes(export_to_excel(analyses, sales_index).getvalue())
+    else:
+        write_columnar_export(analyses, output, sales_index)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store_dir = str(ingest_weekly_data(args.weekly_data, retailers=args.only_retailer, product_groups=args.only_product_group))
+
+    if args.command == 'analyze':
+        analysis = run_analysis(
+            get_sales_index(store_dir), args.retailer, args.product_group, args.start, args.end,
+            args.trade_spend, args.flat_fee, args.gross_margin, args.expected_lift, args.expected_roi,
+            args.baseline, args.baseline_weeks, args.bootstrap
+        )
+        if args.output:
+            analysis['notes'] = ''
+            analysis['analysis_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            _write_analyses([analysis], args.output, get_sales_index(store_dir) if args.weekly_detail else None)
+        else:
+            json.dump(analysis, sys.stdout, indent=2, default=str)
+            sys.stdout.write('\n')
+        return 0
+
+    with open(args.calendar, 'rb') as source:
+        calendar = read_promo_calendar(source, args.calendar)
+    if args.workers > 1 and len(calendar) >= BATCH_PARALLEL_MIN_ROWS:
+        results = run_promo_batch_parallel(store_dir, calendar, args.workers, args.baseline, args.baseline_weeks)
+    else:
+        results = run_promo_batch(get_sales_index(store_dir), calendar, args.baseline, args.baseline_weeks)
+
+    if args.output and args.output.lower().endswith(('.xlsx', '.xls', '.parquet', '.ndjson', '.jsonl')):
+        _write_analyses(batch_results_to_analyses(results), args.output, get_sales_index(store_dir) if args.weekly_detail else None)
+    else:
+        results = results.assign(**{'Product Group(s)': results['Product Group(s)'].map(', '.join)})
+        results.to_csv(args.output or sys.stdout, index=False)
+    return 0
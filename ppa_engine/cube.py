@@ -0,0 +1,85 @@
+"""Daily prefix-sum cube for constant-time window sales"""
+import numpy as np
+import pandas as pd
+
+def _to_days(values):
+    """Dates as int64 days since the epoch"""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[D]').view('int64')
+
+class SalesCube:
+    """Cumulative daily dollars and units per (retailer, product group)
+    
+    Each week row is spread evenly over the 7 days ending on its Week Ending
+    date, which is the same proration get_period_sales applies. The sales of
+    any window are then two lookups into the running totals and a
+    subtraction. A running count of days covered by blank Dollars or Units
+    makes any window touching a blank week NaN, as get_period_sales does.
+    """
+
+    def __init__(self, series):
+        self.series = series
+
+    @classmethod
+    def from_index(cls, sales_index):
+        """Build the cube from a SalesIndex"""
+        return cls({key: cls._cube_series(entry) for key, entry in sales_index.series.items()})
+
+    def updated(self, sales_index, retailers):
+        """New cube with only the given retailers rebuilt from sales_index"""
+        retailers = set(retailers)
+        series = {key: entry for key, entry in self.series.items() if key[0] not in retailers}
+        for key, entry in sales_index.series.items():
+            if key[0] in retailers:
+                series[key] = self._cube_series(entry)
+        return SalesCube(series)
+
+    @staticmethod
+    def _cube_series(entry):
+        if len(entry['weeks']) == 0:
+            return {'origin': 0, 'dollars': np.zeros(1), 'units': np.zeros(1), 'dollars_blank': np.zeros(1), 'units_blank': np.zeros(1)}
+        last_days = entry['weeks'].astype('datetime64[D]').view('int64')
+        origin = last_days.min() - 6
+        # Day offsets of the 7 days each week row covers
+        days = (last_days - origin)[:, None] - np.arange(6, -1, -1)
+        n_days = last_days.max() - origin + 1
+
+        cumulative = {}
+        for name in ('dollars', 'units'):
+            blank = np.isnan(entry[name])
+            daily_share = np.where(blank, 0.0, entry[name]) / 7.0
+            daily = np.bincount(days.ravel(), weights=np.repeat(daily_share, 7), minlength=n_days)
+            cumulative[name] = np.concatenate([[0.0], np.cumsum(daily)])
+            blank_days = np.bincount(days.ravel(), weights=np.repeat(blank, 7), minlength=n_days)
+            cumulative[f'{name}_blank'] = np.concatenate([[0.0], np.cumsum(blank_days)])
+        return {'origin': origin, **cumulative}
+
+    def window_sales_arrays(self, retailer, product_groups, starts, ends):
+        """Dollars and units arrays, one entry per (starts[i], ends[i]) window"""
+        if isinstance(product_groups, str):
+            product_groups = [product_groups]
+        start_days = _to_days(starts)
+        end_days = _to_days(ends)
+        dollars = np.zeros(len(start_days))
+        units = np.zeros(len(start_days))
+        for product_group in dict.fromkeys(product_groups):
+            entry = self.series.get((retailer, product_group))
+            if entry is None:
+                continue
+            n_cum = len(entry['dollars'])
+            lo = np.clip(start_days - entry['origin'], 0, n_cum - 1)
+            hi = np.clip(end_days - entry['origin'] + 1, 0, n_cum - 1)
+            hi = np.maximum(hi, lo)
+            dollars += np.where(entry['dollars_blank'][hi] > entry['dollars_blank'][lo], np.nan, entry['dollars'][hi] - entry['dollars'][lo])
+            units += np.where(entry['units_blank'][hi] > entry['units_blank'][lo], np.nan, entry['units'][hi] - entry['units'][lo])
+        return dollars, units
+
+    def window_sales(self, retailer, product_groups, windows):
+        """Get prorated (dollars, units) for each (start, end) window"""
+        if not windows:
+            return []
+        dollars, units = self.window_sales_arrays(
+            retailer, product_groups,
+            [start for start, _ in windows],
+            [end for _, end in windows]
+        )
+        return [(float(d), float(u)) for d, u in zip(dollars, units)]
@@ -0,0 +1,84 @@
+"""Automatic promo-window detection from weekly unit velocity"""
+import numpy as np
+import pandas as pd
+
+from .baselines import BASELINE_WEEKS, MIN_BASELINE_WEEKS, rolling_baseline, weekly_matrix
+from .batch import CALENDAR_OPTIONAL_COLUMNS, normalize_promo_calendar
+
+# Defaults for the detector
+DETECT_MIN_LIFT_PCT = 30.0
+DETECT_BASELINE_WEEKS = BASELINE_WEEKS
+DETECT_MIN_BASELINE_WEEKS = MIN_BASELINE_WEEKS
+
+DETECTED_COLUMNS = [
+    'Retailer', 'Product Group', 'Promo Start', 'Promo End', 'Weeks',
+    'Baseline Units/Week', 'Promo Units/Week', 'Avg Lift %', 'Peak Lift %'
+]
+
+def detect_promo_windows(sales_index, min_lift_pct=DETECT_MIN_LIFT_PCT,
+                         baseline_weeks=DETECT_BASELINE_WEEKS,
+                         min_baseline_weeks=DETECT_MIN_BASELINE_WEEKS):
+    """Find likely promo windows across every series in a SalesIndex
+
+    A week is flagged when its units beat the trailing median by at least
+    min_lift_pct. Consecutive flagged weeks of a series become one window
+    running from the first week's start to the last Week Ending.
+    """
+    keys, week_axis, matrix = weekly_matrix(sales_index, 'units')
+    if not keys:
+        return pd.DataFrame(columns=DETECTED_COLUMNS)
+    baseline_weeks = int(baseline_weeks)
+    min_baseline_weeks = min(int(min_baseline_weeks), baseline_weeks)
+    baseline = rolling_baseline(matrix, baseline_weeks, min_baseline_weeks)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = matrix / baseline - 1
+    flagged = (baseline > 0) & (lift * 100 >= min_lift_pct)
+
+    # Runs of flagged weeks: a run starts where the previous week is not
+    # flagged and ends where the next one is not
+    edges = np.pad(flagged, ((0, 0), (1, 1)))
+    run_series, run_start = np.nonzero(flagged & ~edges[:, :-2])
+    _, run_end = np.nonzero(flagged & ~edges[:, 2:])
+    if len(run_series) == 0:
+        return pd.DataFrame(columns=DETECTED_COLUMNS)
+
+    week_count = matrix.shape[1]
+    first = run_series * week_count + run_start
+    bounds = np.column_stack([first, run_series * week_count + run_end + 1]).ravel()
+    flat_units = np.append(matrix.ravel(), 0.0)
+    flat_lift = np.append(np.where(flagged, lift, 0.0).ravel(), 0.0)
+    weeks = run_end - run_start + 1
+    promo_units = np.add.reduceat(flat_units, bounds)[::2] / weeks
+    avg_lift = np.add.reduceat(flat_lift, bounds)[::2] / weeks
+    peak_lift = np.maximum.reduceat(flat_lift, bounds)[::2]
+    run_baseline = baseline.ravel()[first]
+
+    run_end_weeks = week_axis[run_series, run_end]
+    starts = week_axis[run_series, run_start] - np.timedelta64(6, 'D')
+    detected = pd.DataFrame({
+        'Retailer': [keys[i][0] for i in run_series],
+        'Product Group': [keys[i][1] for i in run_series],
+        'Promo Start': pd.to_datetime(starts).normalize(),
+        'Promo End': pd.to_datetime(run_end_weeks).normalize(),
+        'Weeks': weeks,
+        'Baseline Units/Week': run_baseline,
+        'Promo Units/Week': promo_units,
+        'Avg Lift %': avg_lift * 100,
+        'Peak Lift %': peak_lift * 100
+    })
+    return detected.sort_values(['Retailer', 'Product Group', 'Promo Start'], ignore_index=True)
+
+def detections_to_calendar(detected):
+    """Promo calendar for detected windows, ready for run_promo_batch"""
+    calendar = pd.DataFrame({
+        'Retailer': detected['Retailer'].astype(str),
+        'Product Group(s)': detected['Product Group'].astype(str),
+        'Promo Start': detected['Promo Start'],
+        'Promo End': detected['Promo End'],
+        'Trade Spend': 0.0
+    })
+    for col, default in CALENDAR_OPTIONAL_COLUMNS.items():
+        calendar[col] = default
+    calendar['Notes'] = [f"Detected: peak lift {lift:.0f}%" for lift in detected['Peak Lift %']]
+    return normalize_promo_calendar(calendar)
@@ -0,0 +1,159 @@
+"""EDLP rate table and spend calculation"""
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# ============================================================================
+# EDLP RATE TABLE - Permanent rates by retailer, product group and date
+# ============================================================================
+# Rates live in a CSV (or Parquet) file, edlp_rates.csv next to this module
+# unless PPA_EDLP_RATES points elsewhere. One row per rate:
+#   Retailer        - must match the GEOGRAPHY column in data
+#   Product Group   - must match the Product Group column
+#   Rate            - dollars per unit (e.g., 0.40 = $0.40 per unit)
+#   Effective From  - first Week Ending the rate applies to (blank = always)
+#   Effective To    - last Week Ending the rate applies to (blank = open)
+#
+# Example: Publix pays $0.40 EDLP on 32oz Core from 2024 on, $0.35 before:
+#   PUBLIX CORP - RMA,32oz Core,0.35,,2023-12-31
+#   PUBLIX CORP - RMA,32oz Core,0.40,2024-01-01,
+#
+# Each week's promo units are priced at the rate in effect for that week, so
+# a rate change never re-prices earlier promotions. The file is re-read when
+# it changes on disk.
+# ============================================================================
+EDLP_RATES_PATH = Path(os.environ.get('PPA_EDLP_RATES', Path(__file__).with_name('edlp_rates.csv')))
+EDLP_RATE_COLUMNS = ['Retailer', 'Product Group', 'Rate', 'Effective From', 'Effective To']
+
+_rate_tables = {}
+_rate_tables_lock = threading.Lock()
+
+def read_edlp_rates(path):
+    """Read and validate an EDLP rate table, sorted for as-of lookups
+
+    Raises ValueError, naming the file, when it cannot be read or parsed.
+    """
+    path = Path(path)
+    try:
+        if path.suffix.lower() == '.parquet':
+            rates = pd.read_parquet(path)
+        else:
+            rates = pd.read_csv(path, dtype={'Retailer': str, 'Product Group': str})
+        rates.columns = rates.columns.astype(str).str.strip()
+        missing = [col for col in EDLP_RATE_COLUMNS[:3] if col not in rates.columns]
+        if missing:
+            raise ValueError(f"missing column(s): {', '.join(missing)}")
+        for col in EDLP_RATE_COLUMNS[3:]:
+            if col not in rates.columns:
+                rates[col] = pd.NaT
+
+        rates = rates[EDLP_RATE_COLUMNS].copy()
+        rates['Retailer'] = rates['Retailer'].astype(str).str.strip()
+        rates['Product Group'] = rates['Product Group'].astype(str).str.strip()
+        rates['Rate'] = pd.to_numeric(rates['Rate'], errors='coerce').fillna(0.0)
+        rates['Effective From'] = pd.to_datetime(rates['Effective From']).fillna(pd.Timestamp.min).astype('datetime64[ns]')
+        rates['Effective To'] = pd.to_datetime(rates['Effective To']).fillna(pd.Timestamp.max).astype('datetime64[ns]')
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException) as e:
+        raise ValueError(f"Cannot read EDLP rate table {path}: {e}") from e
+    return rates.sort_values('Effective From', ignore_index=True)
+
+def load_edlp_rates(path=None):
+    """EDLP rate table, cached and re-read only when the file's mtime changes"""
+    path = Path(path or EDLP_RATES_PATH)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError as e:
+        raise ValueError(f"Cannot read EDLP rate table {path}: {e.strerror or e}") from e
+    with _rate_tables_lock:
+        cached = _rate_tables.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    rates = read_edlp_rates(path)
+    with _rate_tables_lock:
+        _rate_tables[path] = (mtime, rates)
+    return rates
+
+def current_edlp_rates(as_of=None, rates=None):
+    """Rates in effect on as_of (default today) as {retailer: {product group: rate}}"""
+    rates = load_edlp_rates() if rates is None else rates
+    as_of = pd.Timestamp(as_of or datetime.now())
+    active = rates[(rates['Effective From'] <= as_of) & (rates['Effective To'] >= as_of)]
+    current = {}
+    for row in active.itertuples(index=False):
+        current.setdefault(row[0], {})[row[1]] = row[2]
+    return dict(sorted(current.items()))
+
+def get_edlp_rate(retailer, product_group, as_of=None, rates=None):
+    """Get EDLP rate for a retailer/product combination on a date (default today)"""
+    return current_edlp_rates(as_of, rates).get(retailer, {}).get(product_group, 0.0)
+
+def edlp_spend_windows(sales_index, retailers, product_groups, starts, ends, rates=None):
+    """EDLP spend for many promo windows in one as-of join
+
+    Window i covers retailers[i], the list product_groups[i] and
+    starts[i]..ends[i]. Each product group's weekly rows are prorated into
+    the window the same way period sales are, priced at that group's rate
+    in effect for the row's Week Ending, and summed per window. A blank
+    Units week makes its window's spend NaN, like the window's sales.
+    """
+    rates = load_edlp_rates() if rates is None else rates
+    starts = pd.to_datetime(pd.Series(starts)).to_numpy(dtype='datetime64[ns]')
+    ends = pd.to_datetime(pd.Series(ends)).to_numpy(dtype='datetime64[ns]')
+    spend = np.zeros(len(starts))
+    priced = set(zip(rates['Retailer'], rates['Product Group']))
+
+    # Window ids per (retailer, product group) that has a rate at all
+    windows = {}
+    for window, (retailer, groups) in enumerate(zip(retailers, product_groups)):
+        for product_group in dict.fromkeys([groups] if isinstance(groups, str) else groups):
+            if (retailer, product_group) in priced and not np.isnat(starts[window]):
+                windows.setdefault((retailer, product_group), []).append(window)
+
+    parts = []
+    for (retailer, product_group), ids in windows.items():
+        ids = np.asarray(ids)
+        weeks = sales_index.window_weeks(retailer, product_group, starts[ids], ends[ids])
+        if weeks is None or not len(weeks[0]):
+            continue
+        window, week_ending, _, _, units = weeks
+        parts.append(pd.DataFrame({
+            'window': ids[window],
+            'Retailer': retailer,
+            'Product Group': product_group,
+            'Week Ending': week_ending,
+            'units': units
+        }))
+    if not parts:
+        return spend
+
+    weekly = pd.concat(parts, ignore_index=True).sort_values('Week Ending', kind='stable')
+    joined = pd.merge_asof(
+        weekly, rates, left_on='Week Ending', right_on='Effective From',
+        by=['Retailer', 'Product Group'], direction='backward'
+    )
+    in_effect = joined['Week Ending'] <= joined['Effective To']
+    cost = (joined['units'] * joined['Rate'].where(in_effect, 0.0).fillna(0.0)).to_numpy()
+    return spend + np.bincount(joined['window'].to_numpy(), weights=cost, minlength=len(spend))
+
+def calculate_edlp_spend(sales_index, retailer, product_groups, promo_start, promo_end, rates=None):
+    """Calculate EDLP spend for one promotion from the rate table
+    
+    Memoized on the sales index per rate table, so it is priced again only
+    when the window, the data or the rate file changes.
+    """
+    if isinstance(product_groups, str):
+        product_groups = [product_groups]
+    rates = load_edlp_rates() if rates is None else rates
+    key = sales_index.window_key('edlp', retailer, product_groups, promo_start, promo_end)
+    cached = sales_index.memo_get(key)
+    # The memo holds the table itself, so an identity match is a true match
+    if cached is not None and cached[0] is rates:
+        return cached[1]
+    spend = float(edlp_spend_windows(sales_index, [retailer], [product_groups], [promo_start], [promo_end], rates)[0])
+    sales_index.memo_set(key, (rates, spend))
+    return spend
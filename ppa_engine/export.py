@@ -0,0 +1,247 @@
+"""Excel and columnar (Parquet, CSV, NDJSON) exports of saved analyses"""
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .baselines import BASELINE_METHODS, DEFAULT_BASELINE
+
+# Analyses whose weekly detail is computed at once while exporting
+EXPORT_DETAIL_CHUNK = 500
+EXPORT_MAX_COLUMN_WIDTH = 50
+
+# Columnar export formats and their file suffixes
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'csv': '.csv', 'ndjson': '.ndjson'}
+
+DETAIL_COLUMNS = ['Analysis', 'Retailer', 'Product Group', 'Period', 'Week Ending', 'Days In Period', 'Dollars', 'Units']
+_DETAIL_PERIODS = [('Pre-Promo', 'pre_start', 'pre_end'), ('During Promo', 'promo_start', 'promo_end'), ('Post-Promo', 'post_start', 'post_end')]
+
+def _interval_columns(analyses):
+    """Confidence interval bounds as summary columns, blank without intervals"""
+    columns = {}
+    for name, label in (('during_lift', 'During Lift'), ('post_lift', 'Post Lift'), ('roi', 'ROI')):
+        bounds = [(a.get('intervals') or {}).get(name, (None, None)) for a in analyses]
+        columns[f'{label} CI Low %'] = np.array([low for low, _ in bounds], dtype='float64')
+        columns[f'{label} CI High %'] = np.array([high for _, high in bounds], dtype='float64')
+    return columns
+
+def _product_groups(analysis):
+    groups = analysis['product_group']
+    return [groups] if isinstance(groups, str) else list(groups)
+
+def analyses_to_frame(analyses):
+    """Summary table of analyses, one row each, as in the export's Summary sheet
+
+    Analysis numbers the rows from 1, matching weekly_detail.
+    """
+    analyses = list(analyses)
+    periods = pd.DataFrame([a['periods'] for a in analyses], columns=['promo_start', 'promo_end', 'promo_days'])
+    metrics = pd.DataFrame([a['metrics'] for a in analyses],
+                           columns=['incremental_profit', 'edlp_spend', 'during_lift', 'post_lift', 'roi', 'incremental_sales'])
+    values = pd.DataFrame([
+        (a['analysis_date'], a['retailer'], a['pre_sales'], a['pre_units'], a['promo_sales'], a['promo_units'],
+         a['post_sales'], a['post_units'], a['gross_margin_pct'], a['trade_spend'], a['flat_fee'],
+         a['expected_lift'], a['expected_roi'], a['notes'])
+        for a in analyses
+    ], columns=['analysis_date', 'retailer', 'pre_sales', 'pre_units', 'promo_sales', 'promo_units',
+                'post_sales', 'post_units', 'gross_margin_pct', 'trade_spend', 'flat_fee',
+                'expected_lift', 'expected_roi', 'notes'])
+    baselines = [a.get('baseline', DEFAULT_BASELINE) for a in analyses]
+
+    return pd.DataFrame({
+        'Analysis': np.arange(1, len(analyses) + 1),
+        'Analysis ID': pd.array([a.get('id') for a in analyses], dtype='Int64'),
+        'Analysis Date': values['analysis_date'],
+        'Retailer': values['retailer'],
+        'Product Group(s)': [', '.join(_product_groups(a)) for a in analyses],
+        'Promo Start': pd.to_datetime(periods['promo_start']).astype('datetime64[ns]'),
+        'Promo End': pd.to_datetime(periods['promo_end']).astype('datetime64[ns]'),
+        'Promo Days': periods['promo_days'],
+        'Baseline': [BASELINE_METHODS.get(baseline, baseline) for baseline in baselines],
+        'Pre-Promo Sales': values['pre_sales'],
+        'Pre-Promo Units': values['pre_units'],
+        'During Promo Sales': values['promo_sales'],
+        'During Promo Units': values['promo_units'],
+        'During Incr Dollars': values['promo_sales'] - values['pre_sales'],
+        'During Incr Units': values['promo_units'] - values['pre_units'],
+        'Post-Promo Sales': values['post_sales'],
+        'Post-Promo Units': values['post_units'],
+        'Post Incr Dollars': values['post_sales'] - values['pre_sales'],
+        'Post Incr Units': values['post_units'] - values['pre_units'],
+        'Gross Margin %': values['gross_margin_pct'],
+        'Incremental Profit': metrics['incremental_profit'],
+        'EDLP Spend': metrics['edlp_spend'],
+        'Trade Spend': values['trade_spend'],
+        'Flat Fee': values['flat_fee'],
+        'Total Spend': values['trade_spend'] + values['flat_fee'] + metrics['edlp_spend'],
+        'Expected Lift %': values['expected_lift'],
+        'Actual During Lift %': metrics['during_lift'],
+        'Actual Post Lift %': metrics['post_lift'],
+        'Expected ROI %': values['expected_roi'],
+        'Actual ROI %': metrics['roi'],
+        **_interval_columns(analyses),
+        'Incremental Sales': metrics['incremental_sales'],
+        'Notes': values['notes']
+    })
+
+def weekly_detail(sales_index, analyses, first_number=1):
+    """Prorated weekly rows behind each analysis's pre, during and post windows
+
+    One row per (analysis, product group, period, week) the window overlaps,
+    with dollars and units prorated by the days of that week inside it.
+    Analysis numbers the analyses from first_number in the order given.
+    """
+    windows = {}
+    starts, ends, numbers, period_names = [], [], [], []
+    for number, analysis in enumerate(analyses, first_number):
+        for name, start, end in _DETAIL_PERIODS:
+            for product_group in dict.fromkeys(_product_groups(analysis)):
+                windows.setdefault((analysis['retailer'], product_group), []).append(len(starts))
+                starts.append(analysis['periods'][start])
+                ends.append(analysis['periods'][end])
+                numbers.append(number)
+                period_names.append(name)
+    starts = pd.to_datetime(pd.Series(starts, dtype=object)).to_numpy(dtype='datetime64[ns]')
+    ends = pd.to_datetime(pd.Series(ends, dtype=object)).to_numpy(dtype='datetime64[ns]')
+    numbers = np.asarray(numbers)
+    period_names = np.asarray(period_names, dtype=object)
+
+    parts = []
+    for (retailer, product_group), ids in windows.items():
+        ids = np.asarray(ids)
+        weeks = sales_index.window_weeks(retailer, product_group, starts[ids], ends[ids])
+        if weeks is None or not len(weeks[0]):
+            continue
+        window, week_ending, overlap_days, dollars, units = weeks
+        keep = overlap_days > 0
+        ids = ids[window[keep]]
+        parts.append(pd.DataFrame({
+            'Analysis': numbers[ids],
+            'Retailer': retailer,
+            'Product Group': product_group,
+            'Period': period_names[ids],
+            'Week Ending': week_ending[keep],
+            'Days In Period': overlap_days[keep],
+            'Dollars': dollars[keep],
+            'Units': units[keep]
+        }))
+    if not parts:
+        return pd.DataFrame(columns=DETAIL_COLUMNS)
+    detail = pd.concat(parts, ignore_index=True)
+    period_order = pd.Categorical(detail['Period'], [name for name, _, _ in _DETAIL_PERIODS], ordered=True)
+    order = np.lexsort((detail['Week Ending'], detail['Product Group'], period_order.codes, detail['Analysis']))
+    return detail.iloc[order].reset_index(drop=True)
+
+def _column_widths(frame):
+    """Excel column widths fitting each column's longest value and header"""
+    if frame.empty:
+        lengths = np.zeros(len(frame.columns), dtype=int)
+    else:
+        lengths = np.char.str_len(frame.to_numpy(dtype=str)).max(axis=0)
+    headers = np.char.str_len(np.asarray(frame.columns, dtype=str))
+    return np.minimum(np.maximum(lengths, headers) + 2, EXPORT_MAX_COLUMN_WIDTH)
+
+def _cell_rows(frame):
+    """Frame rows as lists of Python values, blank (None) where missing"""
+    # Blank cells for missing values, as pandas' Excel writer leaves them
+    return frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+
+def _write_sheet(workbook, title, columns, rows, widths):
+    """Stream a header and rows into a new write-only sheet"""
+    from openpyxl.utils import get_column_letter
+
+    sheet = workbook.create_sheet(title)
+    for idx, width in enumerate(widths, 1):
+        sheet.column_dimensions[get_column_letter(idx)].width = int(width)
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+
+def export_to_excel(analyses, sales_index=None):
+    """Export analyses to Excel
+
+    Rows stream through a write-only workbook. With a sales_index each
+    analysis also gets a 'Detail N' sheet of its prorated weekly rows,
+    computed EXPORT_DETAIL_CHUNK analyses at a time.
+    """
+    # Imported here so the engine does not pay for openpyxl unless exporting
+    from openpyxl import Workbook
+
+    analyses = list(analyses)
+    summary_df = analyses_to_frame(analyses).drop(columns=['Analysis', 'Analysis ID'])
+    summary_df['Promo Start'] = summary_df['Promo Start'].dt.strftime('%Y-%m-%d')
+    summary_df['Promo End'] = summary_df['Promo End'].dt.strftime('%Y-%m-%d')
+    if sales_index is not None:
+        summary_df['Detail Sheet'] = [f'Detail {number}' for number in range(1, len(analyses) + 1)]
+
+    workbook = Workbook(write_only=True)
+    _write_sheet(workbook, 'Summary', list(summary_df.columns), _cell_rows(summary_df), _column_widths(summary_df))
+
+    if sales_index is not None:
+        for chunk_start in range(0, len(analyses), EXPORT_DETAIL_CHUNK):
+            chunk = analyses[chunk_start:chunk_start + EXPORT_DETAIL_CHUNK]
+            detail = weekly_detail(sales_index, chunk, chunk_start + 1)
+            detail['Week Ending'] = pd.to_datetime(detail['Week Ending']).dt.date
+            # Rows are sorted by analysis, so each sheet is one slice of the chunk
+            numbers = np.arange(chunk_start + 1, chunk_start + len(chunk) + 2)
+            bounds = np.searchsorted(detail['Analysis'].to_numpy(dtype='int64'), numbers)
+            frame = detail.drop(columns='Analysis')
+            columns, rows, widths = list(frame.columns), _cell_rows(frame), _column_widths(frame)
+            for number, lo, hi in zip(numbers, bounds[:-1], bounds[1:]):
+                _write_sheet(workbook, f'Detail {number}', columns, rows[lo:hi], widths)
+
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+def write_table(frame, target, fmt):
+    """Write a frame as Parquet, CSV or newline-delimited JSON to a path or binary buffer"""
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), target)
+    elif fmt == 'csv':
+        frame.to_csv(target, index=False, date_format='%Y-%m-%d')
+    elif fmt == 'ndjson':
+        frame.to_json(target, orient='records', lines=True, date_format='iso', date_unit='s')
+    else:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose one of: {', '.join(COLUMNAR_FORMATS)}")
+
+def export_columnar(analyses, fmt='parquet', sales_index=None):
+    """Analyses (and with a sales_index their weekly detail) as in-memory files
+
+    Returns {'analyses': BytesIO} plus 'weekly_detail' when a sales_index is
+    given. The two tables join on their Analysis column.
+    """
+    analyses = list(analyses)
+    tables = {'analyses': analyses_to_frame(analyses)}
+    if sales_index is not None:
+        tables['weekly_detail'] = weekly_detail(sales_index, analyses)
+    files = {}
+    for name, frame in tables.items():
+        files[name] = BytesIO()
+        write_table(frame, files[name], fmt)
+        files[name].seek(0)
+    return files
+
+def write_columnar_export(analyses, path, sales_index=None):
+    """Write analyses to path, in the format its suffix names, and return the paths written
+
+    With a sales_index the weekly detail goes next to it as <name>.weekly<suffix>.
+    """
+    path = Path(path)
+    formats = {suffix: fmt for fmt, suffix in COLUMNAR_FORMATS.items()}
+    formats['.jsonl'] = 'ndjson'
+    fmt = formats.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the export format from '{path.name}'. Use one of: {', '.join(formats)}")
+    analyses = list(analyses)
+    write_table(analyses_to_frame(analyses), path, fmt)
+    written = [path]
+    if sales_index is not None:
+        detail_path = path.with_name(f'{path.stem}.weekly{path.suffix}')
+        write_table(weekly_detail(sales_index, analyses), detail_path, fmt)
+        written.append(detail_path)
+    return written
@@ -0,0 +1,344 @@
+"""Content-hash keyed ingest of syndicated weekly sales files"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .store import STORE_MANIFEST, derive_weekly_store, read_store_manifest, read_weekly_partition, read_weekly_store, write_weekly_store
+
+# ============================================================================
+# INGEST CACHE - Parsed weekly data keyed on the SHA-256 of the uploaded bytes
+# ============================================================================
+# Parsed frames are kept in a small in-memory LRU shared by every session and
+# persisted as a weekly store so a re-upload (by anyone, or after a restart)
+# skips pd.read_excel entirely. Set PPA_CACHE_DIR to move the on-disk cache.
+# Stores are evicted least recently used first; holders of a store touch it
+# on use and must cope with it having gone.
+# ============================================================================
+INGEST_CACHE_DIR = Path(os.environ.get('PPA_CACHE_DIR', Path.home() / '.cache' / 'ppa_sl_ux'))
+INGEST_CACHE_MEMORY_ENTRIES = 4
+INGEST_CACHE_DISK_ENTRIES = 16
+
+# Columns the engine reads; CSV and Parquet ingest drops everything else
+ENGINE_COLUMNS = ['GEOGRAPHY', 'Product Group', 'Week Ending', 'Dollars', 'Units']
+ENGINE_CSV_DTYPES = {'GEOGRAPHY': 'string', 'Product Group': 'string', 'Dollars': 'float64', 'Units': 'float64'}
+INGEST_CHUNK_ROWS = 250_000
+HASH_BLOCK_BYTES = 1 << 20
+PARQUET_MAGIC = b'PAR1'
+
+class IngestCache:
+    """Bounded LRU of parsed weekly data, in memory and as on-disk weekly stores"""
+
+    def __init__(self, cache_dir, max_memory_entries, max_disk_entries):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def store_path(self, key):
+        """Return the weekly store directory for key, or None if it is not on disk"""
+        store_dir = self.cache_dir / key
+        return store_dir if self.touch(store_dir) else None
+
+    def touch(self, store_dir):
+        """Mark a weekly store as recently used; False if it has been evicted
+
+        Disk eviction drops the least recently used stores, so callers holding
+        on to a store (e.g. a live session) touch it on every use.
+        """
+        manifest_path = Path(store_dir) / STORE_MANIFEST
+        try:
+            os.utime(manifest_path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return manifest_path.exists()
+        return True
+
+    def get(self, key):
+        """Return the cached frame for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        store_dir = self.store_path(key)
+        if store_dir is None:
+            return None
+        try:
+            df = read_weekly_store(store_dir)
+        except (OSError, ValueError, pa.ArrowException):
+            return None
+
+        self._remember(key, df)
+        return df
+
+    def put(self, key, df, metadata=None):
+        """Store a parsed frame under key in memory and as a partitioned weekly store"""
+        self._remember(key, df)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        write_weekly_store(df, self.cache_dir / key, metadata)
+        self._evict_disk()
+        return self.cache_dir / key
+
+    def derive(self, key, base_dir, replaced_partitions, metadata=None):
+        """Store a copy of base_dir with some retailer partitions replaced under key"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        derive_weekly_store(base_dir, self.cache_dir / key, replaced_partitions, metadata)
+        self._evict_disk()
+        return self.cache_dir / key
+
+    def _remember(self, key, df):
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        manifests = sorted(
+            self.cache_dir.glob(f'*/{STORE_MANIFEST}'),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for stale in manifests[self.max_disk_entries:]:
+            shutil.rmtree(stale.parent, ignore_errors=True)
+
+@lru_cache(maxsize=None)
+def get_ingest_cache():
+    """Process-wide ingest cache shared by all callers"""
+    return IngestCache(INGEST_CACHE_DIR, INGEST_CACHE_MEMORY_ENTRIES, INGEST_CACHE_DISK_ENTRIES)
+
+def _source_name(source):
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    return getattr(source, 'name', '') or ''
+
+def _source_format(source):
+    """'csv', 'parquet' or 'excel', from the file name or, failing that, the content"""
+    name = _source_name(source).lower()
+    if name.endswith(('.csv', '.csv.gz', '.txt')):
+        return 'csv'
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if name.endswith(('.xlsx', '.xls', '.xlsm')):
+        return 'excel'
+    with _open_source(source) as handle:
+        head = handle.read(4)
+    return 'parquet' if head == PARQUET_MAGIC else 'excel'
+
+def _open_source(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    return BytesIO(_read_content(source))
+
+def _read_content(source):
+    if isinstance(source, bytes):
+        return source
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        return source.read()
+    return Path(source).read_bytes()
+
+def _filter_spec(retailers, product_groups):
+    if retailers is None and product_groups is None:
+        return None
+    return {
+        'retailers': sorted(retailers) if retailers is not None else None,
+        'product_groups': sorted(product_groups) if product_groups is not None else None
+    }
+
+def content_key(source, retailers=None, product_groups=None):
+    """SHA-256 of a file's bytes (streamed from disk for paths) plus any ingest filters"""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as handle:
+            for block in iter(lambda: handle.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+    else:
+        digest.update(_read_content(source))
+    filters = _filter_spec(retailers, product_groups)
+    if filters is not None:
+        digest.update(json.dumps(filters).encode())
+    return digest.hexdigest()
+
+def _apply_filters(df, retailers, product_groups):
+    if retailers is not None:
+        df = df[df['GEOGRAPHY'].isin(retailers)]
+    if product_groups is not None:
+        df = df[df['Product Group'].isin(product_groups)]
+    return df
+
+def _clean_chunk(chunk, retailers, product_groups):
+    chunk.columns = chunk.columns.str.strip()
+    chunk = _apply_filters(chunk, retailers, product_groups)
+    if 'Week Ending' in chunk.columns:
+        chunk = chunk.assign(**{'Week Ending': pd.to_datetime(chunk['Week Ending'])})
+    return chunk
+
+def _concat_chunks(chunks, columns):
+    chunks = [chunk for chunk in chunks if len(chunk)] or chunks[:1]
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+def read_weekly_csv(source, retailers=None, product_groups=None, chunksize=INGEST_CHUNK_ROWS):
+    """Stream a CSV extract in chunks, keeping engine columns and filtering as it goes"""
+    with _open_source(source) as handle:
+        reader = pd.read_csv(
+            handle,
+            usecols=lambda column: column.strip() in ENGINE_COLUMNS,
+            dtype=ENGINE_CSV_DTYPES,
+            chunksize=chunksize
+        )
+        chunks = [_clean_chunk(chunk, retailers, product_groups) for chunk in reader]
+    return _concat_chunks(chunks, ENGINE_COLUMNS)
+
+def read_weekly_parquet(source, retailers=None, product_groups=None, chunksize=INGEST_CHUNK_ROWS):
+    """Stream a Parquet extract by record batch, keeping engine columns and filtering as it goes"""
+    with _open_source(source) as handle:
+        parquet_file = pq.ParquetFile(handle)
+        columns = [name for name in parquet_file.schema_arrow.names if name.strip() in ENGINE_COLUMNS]
+        chunks = [
+            _clean_chunk(batch.to_pandas(), retailers, product_groups)
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+        ]
+    return _concat_chunks(chunks, ENGINE_COLUMNS)
+
+def parse_weekly_data(source, retailers=None, product_groups=None):
+    """Parse a weekly sales file (Excel, CSV or Parquet) into a clean frame
+    
+    CSV and Parquet are streamed in chunks and reduced to the engine columns
+    as they are read. Excel has to be read whole. retailers and
+    product_groups, when given, keep only those GEOGRAPHY and Product Group
+    values.
+    """
+    source_format = _source_format(source)
+    if source_format == 'csv':
+        return read_weekly_csv(source, retailers, product_groups)
+    if source_format == 'parquet':
+        return read_weekly_parquet(source, retailers, product_groups)
+    
+    with _open_source(source) as handle:
+        df = pd.read_excel(handle)
+    df.columns = df.columns.str.strip()
+    if 'Week Ending' in df.columns:
+        df['Week Ending'] = pd.to_datetime(df['Week Ending'])
+    return _apply_filters(df, retailers, product_groups).reset_index(drop=True)
+
+def _downcast_lossless(values):
+    """Smallest integer or float32 dtype that holds every value exactly, else the input"""
+    numeric = values.to_numpy(dtype='float64', na_value=np.nan)
+    finite = numeric[~np.isnan(numeric)]
+    if not np.isnan(numeric).any() and np.array_equal(finite, np.round(finite)):
+        for dtype in ('int8', 'int16', 'int32'):
+            info = np.iinfo(dtype)
+            if finite.size == 0 or (finite.min() >= info.min and finite.max() <= info.max):
+                return values.astype(dtype)
+    if np.array_equal(numeric.astype('float32').astype('float64'), numeric, equal_nan=True):
+        return values.astype('float32')
+    return values
+
+def compact_weekly_data(df):
+    """Shrink weekly data to what the engine needs
+    
+    Drops non-engine columns, stores GEOGRAPHY and Product Group as
+    categoricals and downcasts Dollars and Units where no value changes
+    (float32 only when every value survives the round trip).
+    """
+    df = df[[col for col in ENGINE_COLUMNS if col in df.columns]]
+    compacted = {}
+    for col in df.columns:
+        if col in ('GEOGRAPHY', 'Product Group'):
+            compacted[col] = df[col].astype('category')
+        elif col in ('Dollars', 'Units') and pd.api.types.is_numeric_dtype(df[col]):
+            compacted[col] = _downcast_lossless(df[col])
+        else:
+            compacted[col] = df[col]
+    return pd.DataFrame(compacted).reset_index(drop=True)
+
+def memory_report(before, after):
+    """Bytes per column before and after compaction, as a JSON-friendly dict"""
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    return {
+        col: {'before': int(before_bytes[col]), 'after': int(after_bytes.get(col, 0))}
+        for col in before.columns
+    }
+
+def _parse_and_compact(source, retailers, product_groups):
+    parsed = parse_weekly_data(source, retailers, product_groups)
+    compacted = compact_weekly_data(parsed)
+    return compacted, {'memory_report': memory_report(parsed, compacted)}
+
+def load_weekly_data(source, cache=None, retailers=None, product_groups=None):
+    """Load weekly sales data from a path, bytes or upload, reusing cached parses"""
+    key = content_key(source, retailers, product_groups)
+    cache = cache or get_ingest_cache()
+    df = cache.get(key)
+    if df is None:
+        df, metadata = _parse_and_compact(source, retailers, product_groups)
+        cache.put(key, df, metadata)
+    return df
+
+def ingest_weekly_data(source, cache=None, retailers=None, product_groups=None):
+    """Parse a file into the partitioned weekly store unless it is already there"""
+    key = content_key(source, retailers, product_groups)
+    cache = cache or get_ingest_cache()
+    store_dir = cache.store_path(key)
+    if store_dir is None:
+        store_dir = cache.put(key, *_parse_and_compact(source, retailers, product_groups))
+    return store_dir
+
+def _merge_delta(existing, delta):
+    """Replace existing rows sharing a (Product Group, Week Ending) with the delta's rows"""
+    def week_keys(frame):
+        return pd.MultiIndex.from_arrays([
+            frame['Product Group'].astype(str).to_numpy(),
+            frame['Week Ending'].to_numpy(dtype='datetime64[ns]')
+        ])
+    superseded = week_keys(existing).isin(week_keys(delta))
+    merged = pd.concat([existing[~superseded], delta], ignore_index=True)
+    return compact_weekly_data(merged)
+
+def append_weekly_data(store_dir, source, cache=None):
+    """Apply a delta file (e.g. the latest weeks) to a weekly store
+    
+    Rows are de-duplicated on (GEOGRAPHY, Product Group, Week Ending) with
+    the delta winning, so re-delivered weeks replace what was there. Only
+    the retailers present in the delta are rewritten. Returns the new store,
+    whose manifest records its parent and the touched retailers so derived
+    indexes can be updated incrementally.
+    """
+    store_dir = Path(store_dir)
+    key = hashlib.sha256(f"{store_dir.name}+{content_key(source)}".encode()).hexdigest()
+    cache = cache or get_ingest_cache()
+    new_store_dir = cache.store_path(key)
+    if new_store_dir is not None:
+        return new_store_dir
+
+    delta = compact_weekly_data(parse_weekly_data(source))
+    replaced = {}
+    for retailer, delta_part in delta.groupby('GEOGRAPHY', sort=True, observed=True):
+        existing = read_weekly_partition(store_dir, str(retailer))
+        replaced[str(retailer)] = _merge_delta(existing, delta_part) if len(existing) else compact_weekly_data(delta_part)
+
+    metadata = dict(read_store_manifest(store_dir).get('metadata', {}))
+    metadata.update({
+        'parent_store': str(store_dir),
+        'touched_retailers': sorted(replaced),
+        'appended_rows': len(delta)
+    })
+    return cache.derive(key, store_dir, replaced, metadata)
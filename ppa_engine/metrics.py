@@ -0,0 +1,71 @@
+"""Lift and ROI metrics"""
+import numpy as np
+
+def _ratio_pct(numerator, denominator):
+    """numerator / denominator * 100, or 0 where the denominator is not positive"""
+    numerator = np.asarray(numerator, dtype='float64')
+    denominator = np.asarray(denominator, dtype='float64')
+    result = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    result = result * 100
+    return result if result.ndim else float(result)
+
+def calculate_metrics(pre_sales, promo_sales, post_sales, trade_spend, flat_fee, pre_units, promo_units, post_units, gross_margin_pct, edlp_spend):
+    """Calculate lift and ROI metrics (scalars or equal-length arrays)"""
+    total_trade_spend = trade_spend + flat_fee + edlp_spend
+    
+    # Lift calculations - UNIT BASED
+    during_lift = _ratio_pct(promo_units - pre_units, pre_units)
+    post_lift = _ratio_pct(post_units - pre_units, pre_units)
+    
+    # Incremental calculations
+    incremental_sales = promo_sales - pre_sales
+    incremental_units = promo_units - pre_units
+    incremental_profit = incremental_sales * (gross_margin_pct / 100)
+    
+    # ROI = (Incremental Profit - Total Trade Spend) / Total Trade Spend × 100
+    roi = _ratio_pct(incremental_profit - total_trade_spend, total_trade_spend)
+    
+    return {
+        'during_lift': during_lift,
+        'post_lift': post_lift,
+        'incremental_sales': incremental_sales,
+        'incremental_units': incremental_units,
+        'incremental_profit': incremental_profit,
+        'gross_margin_pct': gross_margin_pct,
+        'roi': roi,
+        'edlp_spend': edlp_spend
+    }
+
+def sensitivity_grid(analysis, gross_margins, spend_changes_pct, flat_fees=None):
+    """ROI and incremental profit of an analysis over a what-if input grid
+    
+    Evaluates every combination of gross margin (%), item-level trade spend
+    change (% of the analysis's spend) and, optionally, flat fee ($) in one
+    broadcast call to calculate_metrics. Sales and EDLP spend stay fixed, so
+    no sales data is re-read. Result arrays are margin x spend (x fee).
+    """
+    gross_margins = np.asarray(gross_margins, dtype='float64')
+    spend_changes_pct = np.asarray(spend_changes_pct, dtype='float64')
+    trade_spend = analysis['trade_spend'] * (1 + spend_changes_pct / 100)
+    if flat_fees is None:
+        margin_axis, spend_axis, fee_axis = gross_margins[:, None], trade_spend[None, :], analysis['flat_fee']
+    else:
+        flat_fees = np.asarray(flat_fees, dtype='float64')
+        margin_axis, spend_axis, fee_axis = gross_margins[:, None, None], trade_spend[None, :, None], flat_fees[None, None, :]
+    
+    metrics = calculate_metrics(
+        analysis['pre_sales'], analysis['promo_sales'], analysis['post_sales'],
+        spend_axis, fee_axis,
+        analysis['pre_units'], analysis['promo_units'], analysis['post_units'],
+        margin_axis, analysis['metrics']['edlp_spend']
+    )
+    shape = np.broadcast_shapes(np.shape(margin_axis), np.shape(spend_axis), np.shape(fee_axis))
+    return {
+        'gross_margins': gross_margins,
+        'spend_changes_pct': spend_changes_pct,
+        'trade_spend': trade_spend,
+        'flat_fees': flat_fees,
+        'roi': np.broadcast_to(metrics['roi'], shape),
+        'incremental_profit': np.broadcast_to(metrics['incremental_profit'], shape)
+    }
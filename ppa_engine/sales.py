@@ -0,0 +1,328 @@
+"""Promo periods and prorated period sales"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from .baselines import SalesBaselines
+from .cube import SalesCube
+from .store import read_store_manifest, read_weekly_partition
+
+DAY_NS = 86_400_000_000_000
+INDEX_COLUMNS = ['Product Group', 'Week Ending', 'Dollars', 'Units']
+SALES_INDEX_CACHE_ENTRIES = 8
+# Per-window results (prorated sales, EDLP spend) remembered per index
+WINDOW_MEMO_ENTRIES = 4096
+
+_sales_indexes = OrderedDict()
+_sales_indexes_lock = threading.Lock()
+
+def calculate_promo_periods(start_date, end_date):
+    """Calculate pre, during, and post promo periods (scalars or Series of dates)"""
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+    promo_days = (end_date - start_date) // timedelta(days=1) + 1
+    pre_end = start_date - timedelta(days=1)
+    pre_start = pre_end - pd.to_timedelta(promo_days - 1, unit='D')
+    post_start = end_date + timedelta(days=1)
+    post_end = post_start + pd.to_timedelta(promo_days - 1, unit='D')
+    return {
+        'pre_start': pre_start,
+        'pre_end': pre_end,
+        'promo_start': start_date,
+        'promo_end': end_date,
+        'post_start': post_start,
+        'post_end': post_end,
+        'promo_days': promo_days
+    }
+
+def _to_ns(values):
+    """Datetime-like values as int64 nanoseconds, with NaT flagged"""
+    stamps = pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[ns]')
+    return stamps.view('int64'), np.isnat(stamps)
+
+def prorate_weeks(week_ending, dollars, units, starts, ends):
+    """Prorate weekly rows into any number of date windows at once
+    
+    Each week row covers the 7 days ending on its Week Ending date and
+    contributes overlap_days / 7 of its dollars and units to every window it
+    overlaps. Returns arrays of dollars and units, one entry per window.
+    """
+    week_end, missing = _to_ns(week_ending)
+    window_start = _to_ns(starts)[0][:, None]
+    window_end = _to_ns(ends)[0][:, None]
+
+    overlap_start = np.maximum(week_end - 6 * DAY_NS, window_start)
+    overlap_end = np.minimum(week_end, window_end)
+    overlap_days = np.where(
+        (overlap_start <= overlap_end) & ~missing,
+        (overlap_end - overlap_start) // DAY_NS + 1,
+        0
+    )
+    proration_factor = overlap_days / 7.0
+    overlapping = overlap_days > 0
+
+    dollars = np.asarray(dollars, dtype='float64')
+    units = np.asarray(units, dtype='float64')
+    # cumsum accumulates left to right, matching a row-by-row running total
+    # bit for bit; rows outside a window add an exact 0.0
+    prorated_dollars = np.where(overlapping, dollars * proration_factor, 0.0)
+    prorated_units = np.where(overlapping, units * proration_factor, 0.0)
+    if prorated_dollars.shape[1] == 0:
+        return np.zeros(len(window_start)), np.zeros(len(window_start))
+    return np.cumsum(prorated_dollars, axis=1)[:, -1], np.cumsum(prorated_units, axis=1)[:, -1]
+
+def get_windows_sales(df, retailer, product_groups, windows):
+    """Get prorated (dollars, units) for each (start, end) window"""
+    if isinstance(product_groups, str):
+        product_groups = [product_groups]
+    
+    if not windows:
+        return []
+    starts = [pd.to_datetime(start) for start, _ in windows]
+    ends = [pd.to_datetime(end) for _, end in windows]
+    
+    # Only rows whose week can overlap some window are prorated
+    in_scope = (
+        (df['GEOGRAPHY'] == retailer) &
+        (df['Product Group'].isin(product_groups)) &
+        (df['Week Ending'] >= min(starts)) &
+        (df['Week Ending'] <= max(ends) + timedelta(days=7))
+    ).to_numpy(dtype=bool)
+    
+    dollars, units = prorate_weeks(
+        df['Week Ending'].to_numpy()[in_scope],
+        df['Dollars'].to_numpy()[in_scope],
+        df['Units'].to_numpy()[in_scope],
+        starts,
+        ends
+    )
+    return [(float(d), float(u)) for d, u in zip(dollars, units)]
+
+def get_period_sales(df, retailer, product_groups, start_date, end_date, promo_days):
+    """Get sales for a specific period with proration"""
+    return get_windows_sales(df, retailer, product_groups, [(start_date, end_date)])[0]
+
+class SalesIndex:
+    """Week-sorted sales arrays per (retailer, product group) for window lookups
+    
+    Built once per dataset. Each series holds contiguous NumPy arrays of
+    Week Ending, Dollars and Units sorted by week, plus each row's position in
+    the retailer's source data so prorated totals sum in the original order.
+    Window results are memoized on the index, so re-running an analysis with
+    new financial inputs only recomputes its metrics; a reloaded or appended
+    dataset gets a new index and starts with an empty memo.
+    """
+
+    def __init__(self, series, cube=None):
+        self.series = series
+        self._cube = cube
+        self._cube_lock = threading.Lock()
+        self._baselines = None
+        self._baselines_lock = threading.Lock()
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._product_groups = {}
+        for retailer, product_group in series:
+            self._product_groups.setdefault(retailer, []).append(product_group)
+        for groups in self._product_groups.values():
+            groups.sort()
+
+    @classmethod
+    def from_frame(cls, df):
+        """Index a weekly sales frame"""
+        series = {}
+        for retailer, part in df.groupby('GEOGRAPHY', sort=False, observed=True):
+            series.update(cls._index_retailer(retailer, part))
+        return cls(series)
+
+    @classmethod
+    def from_store(cls, store_dir):
+        """Index a weekly store one memory-mapped partition at a time"""
+        series = {}
+        for retailer in read_store_manifest(store_dir)['partitions']:
+            part = read_weekly_partition(store_dir, retailer, INDEX_COLUMNS)
+            series.update(cls._index_retailer(retailer, part))
+        return cls(series)
+
+    def updated(self, store_dir, retailers):
+        """New index with only the given retailers re-read from store_dir"""
+        retailers = set(retailers)
+        series = {key: entry for key, entry in self.series.items() if key[0] not in retailers}
+        for retailer in retailers:
+            part = read_weekly_partition(store_dir, retailer, INDEX_COLUMNS)
+            series.update(self._index_retailer(retailer, part))
+        index = SalesIndex(series)
+        if self._cube is not None:
+            index._cube = self._cube.updated(index, retailers)
+        return index
+
+    def cube(self):
+        """Daily prefix-sum cube over this index, built on first use"""
+        with self._cube_lock:
+            if self._cube is None:
+                self._cube = SalesCube.from_index(self)
+            return self._cube
+
+    def baselines(self):
+        """Precomputed baseline models over this index, built on first use"""
+        with self._baselines_lock:
+            if self._baselines is None:
+                self._baselines = SalesBaselines(self)
+            return self._baselines
+
+    @staticmethod
+    def _index_retailer(retailer, part):
+        weeks = part['Week Ending'].to_numpy(dtype='datetime64[ns]')
+        dollars = part['Dollars'].to_numpy(dtype='float64')
+        units = part['Units'].to_numpy(dtype='float64')
+        has_week = ~np.isnat(weeks)
+
+        series = {}
+        for product_group, positions in part.groupby('Product Group', sort=False, observed=True).indices.items():
+            positions = positions[has_week[positions]]
+            positions = positions[np.argsort(weeks[positions], kind='stable')]
+            series[(retailer, product_group)] = {
+                'weeks': weeks[positions],
+                'dollars': dollars[positions],
+                'units': units[positions],
+                'rows': positions
+            }
+        return series
+
+    def retailers(self):
+        """Sorted retailers present in the index"""
+        return sorted(self._product_groups)
+
+    def product_groups(self, retailer):
+        """Sorted product groups sold at a retailer"""
+        return list(self._product_groups.get(retailer, []))
+
+    def window_sales(self, retailer, product_groups, windows):
+        """Get prorated (dollars, units) for each (start, end) window"""
+        if isinstance(product_groups, str):
+            product_groups = [product_groups]
+        if not windows:
+            return []
+        keys = [self.window_key('sales', retailer, product_groups, start, end) for start, end in windows]
+        cached = [self.memo_get(key) for key in keys]
+        missing = [i for i, totals in enumerate(cached) if totals is None]
+        if missing:
+            computed = self._prorated_window_sales(retailer, product_groups, [windows[i] for i in missing])
+            for i, totals in zip(missing, computed):
+                cached[i] = totals
+                self.memo_set(keys[i], totals)
+        return cached
+
+    @staticmethod
+    def window_key(kind, retailer, product_groups, start, end):
+        """Memo key for a per-window result; product group order does not matter"""
+        groups = frozenset([product_groups] if isinstance(product_groups, str) else product_groups)
+        return (kind, retailer, groups, pd.Timestamp(start), pd.Timestamp(end))
+
+    def memo_get(self, key):
+        """Memoized per-window result, or None"""
+        with self._memo_lock:
+            value = self._memo.get(key)
+            if value is not None:
+                self._memo.move_to_end(key)
+            return value
+
+    def memo_set(self, key, value):
+        """Remember a per-window result, evicting the least recently used"""
+        with self._memo_lock:
+            self._memo[key] = value
+            while len(self._memo) > WINDOW_MEMO_ENTRIES:
+                self._memo.popitem(last=False)
+
+    def _prorated_window_sales(self, retailer, product_groups, windows):
+        starts = [pd.to_datetime(start) for start, _ in windows]
+        ends = [pd.to_datetime(end) for _, end in windows]
+        first_week = np.datetime64(min(starts), 'ns')
+        last_week = np.datetime64(max(ends) + timedelta(days=7), 'ns')
+
+        slices = []
+        for product_group in dict.fromkeys(product_groups):
+            entry = self.series.get((retailer, product_group))
+            if entry is None:
+                continue
+            lo = np.searchsorted(entry['weeks'], first_week, side='left')
+            hi = np.searchsorted(entry['weeks'], last_week, side='right')
+            if hi > lo:
+                slices.append({name: values[lo:hi] for name, values in entry.items()})
+        if not slices:
+            return [(0.0, 0.0) for _ in windows]
+
+        rows = np.concatenate([part['rows'] for part in slices])
+        order = np.argsort(rows, kind='stable')
+        dollars, units = prorate_weeks(
+            np.concatenate([part['weeks'] for part in slices])[order],
+            np.concatenate([part['dollars'] for part in slices])[order],
+            np.concatenate([part['units'] for part in slices])[order],
+            starts,
+            ends
+        )
+        return [(float(d), float(u)) for d, u in zip(dollars, units)]
+
+    def window_weeks(self, retailer, product_group, starts, ends):
+        """Week rows of one series overlapping each (starts[i], ends[i]) window
+        
+        Returns (window, week_ending, overlap_days, dollars, units) arrays with
+        one entry per overlapping (window, week row) pair, dollars and units
+        prorated by overlap_days / 7 as in prorate_weeks (blank weeks stay
+        NaN), or None when the series does not exist.
+        """
+        entry = self.series.get((retailer, product_group))
+        if entry is None:
+            return None
+        starts = pd.to_datetime(pd.Series(starts)).to_numpy(dtype='datetime64[ns]')
+        ends = pd.to_datetime(pd.Series(ends)).to_numpy(dtype='datetime64[ns]')
+        week = np.timedelta64(7, 'D')
+        day = np.timedelta64(1, 'D')
+        lo = np.searchsorted(entry['weeks'], starts, side='left')
+        hi = np.searchsorted(entry['weeks'], ends + week - day, side='right')
+        counts = np.maximum(hi - lo, 0)
+        # Expand each window into the positions of the week rows it touches
+        window = np.repeat(np.arange(len(starts)), counts)
+        positions = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        week_ending = entry['weeks'][positions]
+        overlap_start = np.maximum(week_ending - week + day, starts[window])
+        overlap_end = np.minimum(week_ending, ends[window])
+        overlap_days = np.clip((overlap_end - overlap_start) // day + 1, 0, 7)
+        return (
+            window, week_ending, overlap_days,
+            entry['dollars'][positions] * overlap_days / 7,
+            entry['units'][positions] * overlap_days / 7
+        )
+
+    def period_sales(self, retailer, product_groups, start_date, end_date):
+        """Get prorated (dollars, units) for a single window"""
+        return self.window_sales(retailer, product_groups, [(start_date, end_date)])[0]
+
+def get_sales_index(store_dir):
+    """Sales index for a weekly store, built once per process
+    
+    A store produced by append_weekly_data reuses its parent's index when
+    that is cached, re-indexing only the retailers the delta touched.
+    """
+    store_dir = str(store_dir)
+    with _sales_indexes_lock:
+        if store_dir in _sales_indexes:
+            _sales_indexes.move_to_end(store_dir)
+            return _sales_indexes[store_dir]
+
+    metadata = read_store_manifest(store_dir).get('metadata', {})
+    with _sales_indexes_lock:
+        parent_index = _sales_indexes.get(metadata.get('parent_store'))
+    if parent_index is not None:
+        index = parent_index.updated(store_dir, metadata['touched_retailers'])
+    else:
+        index = SalesIndex.from_store(store_dir)
+
+    with _sales_indexes_lock:
+        _sales_indexes[store_dir] = index
+        while len(_sales_indexes) > SALES_INDEX_CACHE_ENTRIES:
+            _sales_indexes.popitem(last=False)
+    return index
@@ -0,0 +1,128 @@
+"""Arrow IPC weekly store partitioned by GEOGRAPHY"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+# A weekly store is a directory of uncompressed Arrow IPC files, one per
+# retailer (GEOGRAPHY=<retailer>/part-0.arrow), plus a JSON manifest. Partitions
+# are memory-mapped, so reading one retailer never touches the others.
+STORE_MANIFEST = '_manifest.json'
+STORE_PARTITION_FILE = 'part-0.arrow'
+
+def _partition_dirname(retailer):
+    return f"GEOGRAPHY={quote(str(retailer), safe='')}"
+
+def _tmp_store_dir(store_dir):
+    tmp_dir = store_dir.with_name(f"{store_dir.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    return tmp_dir
+
+def _write_partition(tmp_dir, retailer, part):
+    table = pa.Table.from_pandas(part, preserve_index=False)
+    # One retailer per file, so the dictionary holds a single value
+    geo_idx = table.schema.get_field_index('GEOGRAPHY')
+    if not pa.types.is_dictionary(table.schema.field(geo_idx).type):
+        table = table.set_column(geo_idx, 'GEOGRAPHY', table.column(geo_idx).dictionary_encode())
+
+    dirname = _partition_dirname(retailer)
+    (tmp_dir / dirname).mkdir()
+    with pa.OSFile(str(tmp_dir / dirname / STORE_PARTITION_FILE), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return {'path': dirname, 'rows': len(part)}
+
+def _commit_store(tmp_dir, store_dir, columns, partitions, metadata):
+    manifest = {
+        'rows': sum(entry['rows'] for entry in partitions.values()),
+        'columns': list(columns),
+        'partitions': partitions,
+        'metadata': metadata or {}
+    }
+    (tmp_dir / STORE_MANIFEST).write_text(json.dumps(manifest))
+
+    try:
+        os.replace(tmp_dir, store_dir)
+    except OSError:
+        # Another session finished writing the same content first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return store_dir
+
+def write_weekly_store(df, store_dir, metadata=None):
+    """Persist weekly data as uncompressed Arrow IPC files partitioned by GEOGRAPHY
+    
+    metadata, if given, is saved in the manifest alongside the partition list.
+    """
+    store_dir = Path(store_dir)
+    tmp_dir = _tmp_store_dir(store_dir)
+
+    partitions = {}
+    for retailer, part in df.groupby('GEOGRAPHY', sort=True, observed=True):
+        partitions[str(retailer)] = _write_partition(tmp_dir, retailer, part)
+
+    return _commit_store(tmp_dir, store_dir, df.columns, partitions, metadata)
+
+def derive_weekly_store(base_dir, store_dir, replaced_partitions, metadata=None):
+    """Write a new store from base_dir with some retailers' partitions replaced
+    
+    replaced_partitions maps retailer to its complete new frame. Every other
+    partition is hard-linked (or copied) from the base store unchanged.
+    """
+    base_dir = Path(base_dir)
+    store_dir = Path(store_dir)
+    base_manifest = read_store_manifest(base_dir)
+    tmp_dir = _tmp_store_dir(store_dir)
+
+    partitions = {}
+    for retailer, entry in base_manifest['partitions'].items():
+        if retailer in replaced_partitions:
+            continue
+        (tmp_dir / entry['path']).mkdir()
+        source = base_dir / entry['path'] / STORE_PARTITION_FILE
+        target = tmp_dir / entry['path'] / STORE_PARTITION_FILE
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+        partitions[retailer] = entry
+    for retailer, part in replaced_partitions.items():
+        if len(part):
+            partitions[str(retailer)] = _write_partition(tmp_dir, retailer, part)
+
+    partitions = dict(sorted(partitions.items()))
+    return _commit_store(tmp_dir, store_dir, base_manifest['columns'], partitions, metadata)
+
+def read_store_manifest(store_dir):
+    """Read the manifest describing a weekly store"""
+    return json.loads((Path(store_dir) / STORE_MANIFEST).read_text())
+
+def _read_partition_table(store_dir, entry, columns=None):
+    source = pa.memory_map(str(Path(store_dir) / entry['path'] / STORE_PARTITION_FILE), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+def read_weekly_partition(store_dir, retailer, columns=None):
+    """Read one retailer's weekly data from a memory-mapped store partition"""
+    manifest = read_store_manifest(store_dir)
+    entry = manifest['partitions'].get(retailer)
+    if entry is None:
+        return pd.DataFrame(columns=columns if columns is not None else manifest['columns'])
+    return _read_partition_table(store_dir, entry, columns).to_pandas()
+
+def read_weekly_store(store_dir, columns=None):
+    """Read every partition of a weekly store back into one frame"""
+    manifest = read_store_manifest(store_dir)
+    tables = [_read_partition_table(store_dir, entry, columns) for entry in manifest['partitions'].values()]
+    if not tables:
+        return pd.DataFrame(columns=columns if columns is not None else manifest['columns'])
+    # Partitions rewritten by derive_weekly_store may use wider dtypes
+    return pa.concat_tables(tables, promote_options='permissive').to_pandas()
@@ -0,0 +1,75 @@
+"""Bootstrap confidence intervals for lift and ROI"""
+import numpy as np
+import pandas as pd
+
+from .baselines import BASELINE_WEEKS, MIN_BASELINE_WEEKS, rolling_baseline
+from .detect import DETECT_MIN_LIFT_PCT
+from .metrics import calculate_metrics
+
+BOOTSTRAP_DRAWS = 2000
+CONFIDENCE_LEVEL = 95.0
+# Fewer non-promo weeks than this and no intervals are reported
+BOOTSTRAP_MIN_WEEKS = 8
+BOOTSTRAP_SEED = 0
+
+def non_promo_weeks(sales_index, retailer, product_groups, exclude_start, exclude_end):
+    """Weekly (dollars, units) of a series outside promotions
+
+    Drops weeks overlapping exclude_start..exclude_end and weeks whose units
+    beat their trailing median by the detector's lift threshold.
+    """
+    baselines = sales_index.baselines()
+    weekly = baselines.weekly_series(retailer, product_groups)
+    if weekly is None:
+        return np.array([]), np.array([])
+    dollars, units = weekly
+    trailing = rolling_baseline(units[None], BASELINE_WEEKS, MIN_BASELINE_WEEKS)[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        promo_like = (trailing > 0) & ((units / trailing - 1) * 100 >= DETECT_MIN_LIFT_PCT)
+    week_endings = baselines.week_endings(retailer, product_groups)
+    overlaps = (week_endings - np.timedelta64(6, 'D') <= np.datetime64(pd.Timestamp(exclude_end), 'ns')) & (
+        week_endings >= np.datetime64(pd.Timestamp(exclude_start), 'ns')
+    )
+    keep = ~np.isnan(units) & ~promo_like & ~overlaps
+    return dollars[keep], units[keep]
+
+def bootstrap_intervals(sales_index, analysis, draws=BOOTSTRAP_DRAWS, confidence=CONFIDENCE_LEVEL, seed=BOOTSTRAP_SEED):
+    """Confidence intervals for during_lift, post_lift and roi of an analysis
+
+    Each draw resamples, with replacement, as many non-promo weeks as the
+    baseline window spans and scales the analysis's baseline by how far
+    that sample's average strays from the average of all non-promo weeks.
+    All draws are evaluated together in one calculate_metrics call.
+    Returns None when the series has too little non-promo history.
+    """
+    periods = analysis['periods']
+    dollars, units = non_promo_weeks(
+        sales_index, analysis['retailer'], analysis['product_group'], periods['promo_start'], periods['post_end']
+    )
+    if len(units) < BOOTSTRAP_MIN_WEEKS or units.mean() <= 0 or dollars.mean() <= 0:
+        return None
+
+    sample_weeks = max(1, round(periods['promo_days'] / 7))
+    picks = np.random.default_rng(seed).integers(0, len(units), size=(draws, sample_weeks))
+    pre_sales = analysis['pre_sales'] * dollars[picks].mean(axis=1) / dollars.mean()
+    pre_units = analysis['pre_units'] * units[picks].mean(axis=1) / units.mean()
+
+    metrics = calculate_metrics(
+        pre_sales, analysis['promo_sales'], analysis['post_sales'],
+        analysis['trade_spend'], analysis['flat_fee'],
+        pre_units, analysis['promo_units'], analysis['post_units'],
+        analysis['gross_margin_pct'], analysis['metrics']['edlp_spend']
+    )
+    tail = (100 - confidence) / 2
+    bounds = np.percentile(
+        np.stack([np.broadcast_to(metrics[name], (draws,)) for name in ('during_lift', 'post_lift', 'roi')]),
+        [tail, 100 - tail], axis=1
+    )
+    return {
+        'during_lift': (float(bounds[0, 0]), float(bounds[1, 0])),
+        'post_lift': (float(bounds[0, 1]), float(bounds[1, 1])),
+        'roi': (float(bounds[0, 2]), float(bounds[1, 2])),
+        'confidence': confidence,
+        'draws': draws,
+        'weeks': len(units)
+    }
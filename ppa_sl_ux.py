@@ -1,137 +1,46 @@
+import os
+
+import numpy as np
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from io import BytesIO
+from datetime import datetime
 
-# ============================================================================
-# EDLP RATE CONFIGURATION - Permanent rates by retailer and product group
-# ============================================================================
-# To add or update EDLP rates:
-# 1. Add retailer name as key (must match GEOGRAPHY column in data)
-# 2. Add product groups as nested dict (must match Product Group column)
-# 3. Set rate as dollar amount per unit (e.g., 0.40 = $0.40 per unit)
-#
-# Example: If Publix pays $0.40 EDLP on every 32oz Core unit sold:
-#   'Publix': {'32oz Core': 0.40}
-#
-# Rates are automatically applied to all units sold during promo period
-# ============================================================================
-EDLP_RATES = {
-    "AC - ALBERTSONSCO ACME - RMA": {
-        '10oz Core': 0.25,
-        '4pk Core': 1.05,
-    },
-    "AC - ALBERTSONSCO INTERMOUNTAIN DIV W/ SLC - RMA": {
-        '16oz Core': 0.40,
-        '32oz Core': 0.80,
-    },
-    "AC - ALBERTSONSCO PORTLAND, OR DIV - RMA": {
-        '16oz Core': 0.46,
-    },
-    "AC - ALBERTSONSCO SHAWS DIV W/ STAR MARKET - RMA": {
-        '16oz Core': 0.20,
-        '32oz Core': 0.72,
-    },
-    "AC - ALBERTSONSCO SOUTHERN CALIFORNIA DIV - RMA": {
-        '10oz Core': 0.15,
-        '16oz Core': 0.17,
-        '16oz Innovation': 0.17,
-        '32oz Core': 0.32,
-    },
-    "AC - ALBERTSONSCO SOUTHERN DIV - RMA": {
-        '10oz Smoothie': 0.22,
-        '16oz Core': 0.36,
-        '16oz Innovation': 0.36,
-        '32oz Core': 0.66,
-    },
-    "AC - ALBERTSONSCO MID-ATLANTIC DIV - RMA": {
-        '10oz Core': 0.22,
-        '16oz Core': 0.36,
-        '16oz Innovation': 0.36,
-        '32oz Core': 0.70,
-        '32oz Innovation': 0.70,
-    },
-    "AD - AHOLD GIANT CARLISLE DIV - RMA": {
-        '24oz Core': 0.62,
-    },
-    "AD - DELHAIZE FOOD LION CORP - RMA": {
-        '16oz Innovation': 0.17,
-        '32oz Core': 0.52,
-    },
-    "ASSOCIATED WHOLESALE GROCERS CORP - SRMA": {
-        '16oz Innovation': 0.46,
-    },
-    "BIG Y - RMA": {
-        '16oz Core': 0.16,
-        '32oz Core': 0.32,
-    },
-    "BJS CORP - RMA": {
-        '10oz 6ct': 0.69,
-    },
-    "GELSONS MARKETS - TOTAL US": {
-        '10oz Core': 0.06,
-        '10oz Smoothie': 0.03,
-        '16oz Core': 0.11,
-        '16oz Innovation': 0.11,
-        '24oz Core': 0.06,
-        '32oz Core': 0.32,
-        '4.4oz Core': 0.05,
-    },
-    "KROGER CORP - RMA": {
-        '24oz Core': 0.55,
-    },
-    "MOTHERS MARKET - TOTAL US": {
-        '16oz Core': 0.26,
-        '32oz Core': 0.52,
-    },
-    "PUBLIX CORP - RMA": {
-        '32oz Core': 0.65,
-        '32oz Innovation': 0.69,
-    },
-    "RALEYS - TOTAL US": {
-        '24oz Core': 0.45,
-    },
-    "SOUTHEASTERN GROCERS CORP - RMA": {
-        '16oz Core': 0.30,
-        '16oz Innovation': 0.30,
-        '32oz Core': 0.60,
-    },
-    "SPROUTS FARMERS MARKET - TOTAL US W/O PL": {
-        '10oz Core': 0.02,
-        '10oz Smoothie': 0.40,
-        '16oz Innovation': 0.38,
-        '24oz Core': 0.65,
-        '32oz Core': 0.06,
-        '4.4oz Core': 0.01,
-    },
-    "STATER BROS CORP - RMA": {
-        '16oz Core': 0.35,
-        '16oz Innovation': 0.35,
-        '32oz Core': 0.70,
-    },
-    "TARGET CORP W/ AK/HI - RMA": {
-        '4pk Core': 0.47,
-    },
-    "WAKEFERN CORP W/O PRICE RITE - RMA": {
-        '10oz Core': 0.10,
-        '24oz Core': 0.65,
-        '32oz Core': 0.36,
-        '4.4oz Core': 0.12,
-    },
-    "WALMART CORP - RMA": {
-        '16oz Core': 0.51,
-        '32oz Core': 0.72,
-    },
-    "WEGMANS CORP W/O NYC - RMA": {
-        '10oz Smoothie': 0.36,
-        '16oz Core': 0.38,
-        '16oz Innovation': 0.38,
-        '32oz Core': 0.72,
-    },
-}
+from ppa_engine import (
+    BASELINE_METHODS,
+    BASELINE_WEEKS,
+    BATCH_PARALLEL_MIN_ROWS,
+    BOOTSTRAP_DRAWS,
+    CALENDAR_OPTIONAL_COLUMNS,
+    CALENDAR_REQUIRED_COLUMNS,
+    COLUMNAR_FORMATS,
+    DETECT_BASELINE_WEEKS,
+    DETECT_MIN_LIFT_PCT,
+    ANALYSIS_PAGE_SIZE,
+    ANALYSIS_SORT_COLUMNS,
+    EDLP_RATES_PATH,
+    ROLLUP_LEVELS,
+    batch_results_to_analyses,
+    current_edlp_rates,
+    detect_promo_windows,
+    detections_to_calendar,
+    export_columnar,
+    export_to_excel,
+    get_analysis_store,
+    get_edlp_rate,
+    get_sales_index,
+    normalize_promo_calendar,
+    read_promo_calendar,
+    read_store_manifest,
+    run_analysis,
+    run_promo_batch,
+    run_promo_batch_parallel,
+    sensitivity_grid,
+)
+from ppa_engine import ingest
 
-# ============================================================================
+# Figures are memoized on their inputs and shared across reruns and sessions;
+# st.plotly_chart only serializes them, so one cached object can be reused
+CHART_CACHE_ENTRIES = 128
 
 # Page configuration
 st.set_page_config(
@@ -431,133 +340,64 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'weekly_data' not in st.session_state:
-    st.session_state.weekly_data = None
-if 'promo_analyses' not in st.session_state:
-    st.session_state.promo_analyses = []
+if 'weekly_store' not in st.session_state:
+    st.session_state.weekly_store = None
 if 'current_analysis' not in st.session_state:
     st.session_state.current_analysis = None
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+if 'detected_promos' not in st.session_state:
+    st.session_state.detected_promos = None
+if 'batch_calendar' not in st.session_state:
+    st.session_state.batch_calendar = None
+
+def prefill_analysis_form(detection):
+    """Fill the New Analysis form from a detected promotion"""
+    st.session_state.form_retailer = detection['Retailer']
+    st.session_state.form_product_groups = [detection['Product Group']]
+    st.session_state.form_promo_start = detection['Promo Start'].date()
+    st.session_state.form_promo_end = detection['Promo End'].date()
+
+def baseline_label(analysis):
+    """Title and period or method caption for an analysis's baseline column"""
+    if analysis.get('baseline', 'pre_period') == 'pre_period':
+        periods = analysis['periods']
+        return "Pre-Promo Baseline", f"{periods['pre_start'].strftime('%b %d')} - {periods['pre_end'].strftime('%b %d, %Y')}"
+    return "Baseline", BASELINE_METHODS[analysis['baseline']]
 
-def load_weekly_data(uploaded_file):
-    """Load and process weekly sales data"""
+def queue_detections(detected):
+    """Queue detected promotions as a batch calendar"""
+    st.session_state.batch_calendar = detections_to_calendar(detected)
+
+def ingest_upload(uploaded_file):
+    """Load an uploaded weekly sales file into the weekly store"""
     try:
-        df = pd.read_excel(uploaded_file)
-        if 'Week Ending' in df.columns:
-            df['Week Ending'] = pd.to_datetime(df['Week Ending'])
-        df.columns = df.columns.str.strip()
-        return df
+        return str(ingest.ingest_weekly_data(uploaded_file))
     except Exception as e:
         st.error(f"Error loading file: {str(e)}")
         return None
 
-def calculate_promo_periods(start_date, end_date):
-    """Calculate pre, during, and post promo periods"""
-    start_date = pd.to_datetime(start_date)
-    end_date = pd.to_datetime(end_date)
-    promo_days = (end_date - start_date).days + 1
-    pre_end = start_date - timedelta(days=1)
-    pre_start = pre_end - timedelta(days=promo_days - 1)
-    post_start = end_date + timedelta(days=1)
-    post_end = post_start + timedelta(days=promo_days - 1)
-    return {
-        'pre_start': pre_start,
-        'pre_end': pre_end,
-        'promo_start': start_date,
-        'promo_end': end_date,
-        'post_start': post_start,
-        'post_end': post_end,
-        'promo_days': promo_days
-    }
-
-def get_period_sales(df, retailer, product_groups, start_date, end_date, promo_days):
-    """Get sales for a specific period with proration"""
-    if isinstance(product_groups, str):
-        product_groups = [product_groups]
-    
-    filtered_df = df[
-        (df['GEOGRAPHY'] == retailer) &
-        (df['Product Group'].isin(product_groups))
-    ].copy()
-    
-    if filtered_df.empty:
-        return 0, 0
-    
-    period_data = filtered_df[
-        (filtered_df['Week Ending'] >= start_date) &
-        (filtered_df['Week Ending'] <= end_date + timedelta(days=7))
-    ].copy()
-    
-    if period_data.empty:
-        return 0, 0
-    
-    total_dollars = 0
-    total_units = 0
-    
-    for _, row in period_data.iterrows():
-        week_end = row['Week Ending']
-        week_start = week_end - timedelta(days=6)
-        overlap_start = max(week_start, start_date)
-        overlap_end = min(week_end, end_date)
-        
-        if overlap_start <= overlap_end:
-            overlap_days = (overlap_end - overlap_start).days + 1
-            proration_factor = overlap_days / 7.0
-            total_dollars += row['Dollars'] * proration_factor
-            total_units += row['Units'] * proration_factor
-    
-    return total_dollars, total_units
-
-def calculate_edlp_spend(retailer, product_groups, units):
-    """Calculate EDLP spend based on hardcoded rates"""
-    if isinstance(product_groups, str):
-        product_groups = [product_groups]
-    
-    total_edlp = 0
-    
-    # Check if retailer has any EDLP rates configured
-    if retailer in EDLP_RATES:
-        for product_group in product_groups:
-            # Check if this specific product group has an EDLP rate
-            if product_group in EDLP_RATES[retailer]:
-                rate_per_unit = EDLP_RATES[retailer][product_group]
-                total_edlp += units * rate_per_unit
-    
-    return total_edlp
-
-def get_edlp_rate(retailer, product_group):
-    """Get EDLP rate for a specific retailer/product combination"""
-    if retailer in EDLP_RATES:
-        if product_group in EDLP_RATES[retailer]:
-            return EDLP_RATES[retailer][product_group]
-    return 0.0
+def current_weekly_store(uploaded_file):
+    """The session's weekly store, re-ingesting the upload if the cache evicted it"""
+    store_dir = st.session_state.weekly_store
+    if store_dir is None or ingest.get_ingest_cache().touch(store_dir):
+        return store_dir
+    st.session_state.weekly_store = ingest_upload(uploaded_file) if uploaded_file else None
+    if st.session_state.weekly_store is not None:
+        st.warning("Cached sales data expired and was reloaded from the upload; re-apply any appended deltas")
+    else:
+        st.warning("Cached sales data expired; upload it again to continue")
+    return st.session_state.weekly_store
 
-def calculate_metrics(pre_sales, promo_sales, post_sales, trade_spend, flat_fee, pre_units, promo_units, post_units, gross_margin_pct, edlp_spend):
-    """Calculate lift and ROI metrics"""
-    total_trade_spend = trade_spend + flat_fee + edlp_spend
-    
-    # Lift calculations - UNIT BASED
-    during_lift = ((promo_units - pre_units) / pre_units * 100) if pre_units > 0 else 0
-    post_lift = ((post_units - pre_units) / pre_units * 100) if pre_units > 0 else 0
-    
-    # Incremental calculations
-    incremental_sales = promo_sales - pre_sales
-    incremental_units = promo_units - pre_units
-    incremental_profit = incremental_sales * (gross_margin_pct / 100)
-    
-    # ROI = (Incremental Profit - Total Trade Spend) / Total Trade Spend × 100
-    roi = ((incremental_profit - total_trade_spend) / total_trade_spend * 100) if total_trade_spend > 0 else 0
-    
-    return {
-        'during_lift': during_lift,
-        'post_lift': post_lift,
-        'incremental_sales': incremental_sales,
-        'incremental_units': incremental_units,
-        'incremental_profit': incremental_profit,
-        'gross_margin_pct': gross_margin_pct,
-        'roi': roi,
-        'edlp_spend': edlp_spend
-    }
+def append_upload(store_dir, delta_file):
+    """Apply an uploaded delta file to the current weekly store"""
+    try:
+        return str(ingest.append_weekly_data(store_dir, delta_file))
+    except Exception as e:
+        st.error(f"Error appending file: {str(e)}")
+        return None
 
+@st.cache_resource(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
 def create_performance_chart(pre_sales, promo_sales, post_sales):
     """Create modern bar chart"""
     fig = go.Figure(data=[
@@ -599,6 +439,7 @@ def create_performance_chart(pre_sales, promo_sales, post_sales):
     )
     return fig
 
+@st.cache_resource(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
 def create_lift_gauge(actual_lift, expected_lift):
     """Create modern gauge chart for unit lift"""
     fig = go.Figure(go.Indicator(
@@ -642,62 +483,373 @@ def create_lift_gauge(actual_lift, expected_lift):
     )
     return fig
 
-def export_to_excel(analyses):
-    """Export analyses to Excel"""
-    output = BytesIO()
+def create_sensitivity_heatmap(grid, value='roi'):
+    """Create heatmap of ROI or incremental profit over margin x spend change"""
+    is_roi = value == 'roi'
+    fig = go.Figure(go.Heatmap(
+        z=grid[value],
+        x=grid['spend_changes_pct'],
+        y=grid['gross_margins'],
+        customdata=np.broadcast_to(grid['trade_spend'], grid[value].shape),
+        colorscale=[[0, '#e57b8f'], [0.5, '#f8f9fa'], [1, '#7cb342']],
+        zmid=0,
+        colorbar=dict(title='ROI (%)' if is_roi else 'Profit ($)'),
+        hovertemplate=(
+            'Gross Margin: %{y:.1f}%<br>Spend Change: %{x:+.0f}% ($%{customdata:,.0f})<br>'
+            + ('ROI: %{z:.1f}%' if is_roi else 'Incremental Profit: $%{z:,.0f}')
+            + '<extra></extra>'
+        )
+    ))
     
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        summary_data = []
-        for analysis in analyses:
-            if isinstance(analysis['product_group'], list):
-                product_group_str = ', '.join(analysis['product_group'])
-            else:
-                product_group_str = str(analysis['product_group'])
-            
-            summary_data.append({
-                'Analysis Date': analysis['analysis_date'],
-                'Retailer': analysis['retailer'],
-                'Product Group(s)': product_group_str,
-                'Promo Start': analysis['periods']['promo_start'].strftime('%Y-%m-%d'),
-                'Promo End': analysis['periods']['promo_end'].strftime('%Y-%m-%d'),
-                'Promo Days': analysis['periods']['promo_days'],
-                'Pre-Promo Sales': analysis['pre_sales'],
-                'Pre-Promo Units': analysis['pre_units'],
-                'During Promo Sales': analysis['promo_sales'],
-                'During Promo Units': analysis['promo_units'],
-                'During Incr Dollars': analysis['promo_sales'] - analysis['pre_sales'],
-                'During Incr Units': analysis['promo_units'] - analysis['pre_units'],
-                'Post-Promo Sales': analysis['post_sales'],
-                'Post-Promo Units': analysis['post_units'],
-                'Post Incr Dollars': analysis['post_sales'] - analysis['pre_sales'],
-                'Post Incr Units': analysis['post_units'] - analysis['pre_units'],
-                'Gross Margin %': analysis['gross_margin_pct'],
-                'Incremental Profit': analysis['metrics']['incremental_profit'],
-                'EDLP Spend': analysis['metrics']['edlp_spend'],
-                'Trade Spend': analysis['trade_spend'],
-                'Flat Fee': analysis['flat_fee'],
-                'Total Spend': analysis['trade_spend'] + analysis['flat_fee'] + analysis['metrics']['edlp_spend'],
-                'Expected Lift %': analysis['expected_lift'],
-                'Actual During Lift %': analysis['metrics']['during_lift'],
-                'Actual Post Lift %': analysis['metrics']['post_lift'],
-                'Expected ROI %': analysis['expected_roi'],
-                'Actual ROI %': analysis['metrics']['roi'],
-                'Incremental Sales': analysis['metrics']['incremental_sales'],
-                'Notes': analysis['notes']
-            })
+    fig.update_layout(
+        title={
+            'text': 'ROI Sensitivity' if is_roi else 'Incremental Profit Sensitivity',
+            'font': {'size': 20, 'color': '#2c3e50', 'family': 'Inter', 'weight': 700}
+        },
+        xaxis_title='Trade Spend Change (%)',
+        yaxis_title='Gross Margin (%)',
+        height=450,
+        template='plotly_white',
+        paper_bgcolor='white',
+        font=dict(color='#475569', family='Inter'),
+        margin=dict(t=50, b=20, l=20, r=20)
+    )
+    return fig
+
+@st.cache_resource(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def create_comparison_chart(labels, during_lifts, post_lifts, rois):
+    """Create one grouped bar chart comparing lift and ROI across analyses"""
+    fig = go.Figure(data=[
+        go.Bar(name='During Lift %', x=labels, y=during_lifts, marker_color='#7cb342'),
+        go.Bar(name='Post Lift %', x=labels, y=post_lifts, marker_color='#e57b8f'),
+        go.Bar(name='ROI %', x=labels, y=rois, marker_color='#9e9e9e')
+    ])
+    
+    fig.update_layout(
+        title={
+            'text': 'Analysis Comparison',
+            'font': {'size': 20, 'color': '#2c3e50', 'family': 'Inter', 'weight': 700}
+        },
+        barmode='group',
+        yaxis_title='Percent (%)',
+        yaxis=dict(gridcolor='#f1f5f9', zeroline=True, zerolinecolor='#cbd5e1'),
+        xaxis=dict(tickangle=-30),
+        height=450,
+        template='plotly_white',
+        paper_bgcolor='white',
+        font=dict(color='#475569', family='Inter'),
+        margin=dict(t=50, b=20, l=20, r=20)
+    )
+    return fig
+
+def create_rollup_chart(rollup, level):
+    """Create bar chart of spend vs incremental profit per rollup row"""
+    labels = rollup[level].astype(str)
+    fig = go.Figure(data=[
+        go.Bar(name='Total Spend', x=labels, y=rollup['Total Spend'], marker_color='#9e9e9e'),
+        go.Bar(
+            name='Incremental Profit', x=labels, y=rollup['Incremental Profit'], marker_color='#7cb342',
+            customdata=rollup['ROI %'],
+            hovertemplate='%{x}<br>Incremental Profit: $%{y:,.0f}<br>ROI: %{customdata:.1f}%<extra></extra>'
+        )
+    ])
+    
+    fig.update_layout(
+        title={
+            'text': f'Spend vs Incremental Profit by {level}',
+            'font': {'size': 20, 'color': '#2c3e50', 'family': 'Inter', 'weight': 700}
+        },
+        barmode='group',
+        yaxis_title='Dollars ($)',
+        yaxis=dict(gridcolor='#f1f5f9', zeroline=False),
+        height=400,
+        template='plotly_white',
+        paper_bgcolor='white',
+        font=dict(color='#475569', family='Inter'),
+        margin=dict(t=50, b=20, l=20, r=20)
+    )
+    return fig
+
+@st.fragment
+def new_analysis_form(sales_index, analysis_store):
+    """New Analysis form; input changes rerun only this fragment"""
+    retailers = sales_index.retailers()
+    
+    st.markdown("## 🎯 Promotion Configuration")
+    
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.markdown("### Product & Retailer")
+        retailer = st.selectbox("Retailer", retailers, key='form_retailer')
+        product_groups = sales_index.product_groups(retailer)
+        product_group = st.multiselect(
+            "Product Group(s)", product_groups, key='form_product_groups',
+            help="Select one or more product groups"
+        )
+        
+        st.markdown("### Timing")
+        date_col1, date_col2 = st.columns(2)
+        with date_col1:
+            promo_start = st.date_input("Promo Start Date", key='form_promo_start')
+        with date_col2:
+            promo_end = st.date_input("Promo End Date", key='form_promo_end')
+        
+        st.markdown("### Baseline")
+        baseline = st.selectbox(
+            "Baseline Model",
+            list(BASELINE_METHODS),
+            format_func=BASELINE_METHODS.get,
+            help="What sales would have been without the promotion"
+        )
+        baseline_weeks = BASELINE_WEEKS
+        if baseline == 'trailing_median':
+            baseline_weeks = st.number_input("Trailing Weeks", 2, 52, BASELINE_WEEKS)
+        with_intervals = st.checkbox(
+            "Confidence Intervals",
+            help=f"Bootstrap {BOOTSTRAP_DRAWS:,} resamples of non-promo weeks for lift and ROI ranges"
+        )
+    
+    with col2:
+        st.markdown("### Financial Inputs")
+        trade_spend = st.number_input(
+            "Item-Level Trade Spend ($)",
+            0.0,
+            step=100.0,
+            help="Total promotional trade spend: discounts, off-invoice, scan-based allowances (EDLP rates auto-applied from the rate table)"
+        )
         
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        # Show EDLP info if configured
+        if retailer and product_group:
+            edlp_info = []
+            for pg in product_group:
+                rate = get_edlp_rate(retailer, pg, promo_start)
+                if rate > 0:
+                    edlp_info.append(f"{pg}: ${rate:.2f}/unit")
+            if edlp_info:
+                st.info(f"💡 **EDLP rates configured:**\n\n" + "\n\n".join(edlp_info) + "\n\n*Rates in effect at promo start; each week's units use that week's rate*")
         
-        workbook = writer.book
-        worksheet = writer.sheets['Summary']
+        flat_fee = st.number_input(
+            "Additional Fees ($)",
+            0.0,
+            step=100.0,
+            help="Slotting fees, display fees, co-op advertising"
+        )
+        gross_margin_pct = st.number_input(
+            "Gross Margin (%)",
+            0.0,
+            100.0,
+            30.0,
+            step=5.0,
+            help="Gross margin = (Net Price - COGS) / Net Price × 100"
+        )
         
-        for idx, col in enumerate(summary_df.columns):
-            max_length = max(summary_df[col].astype(str).apply(len).max(), len(col)) + 2
-            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+        st.markdown("### Performance Expectations")
+        exp_col1, exp_col2 = st.columns(2)
+        with exp_col1:
+            expected_lift = st.number_input("Expected Lift (%)", 0.0, step=5.0)
+        with exp_col2:
+            expected_roi = st.number_input(
+                "Expected ROI (%)",
+                -100.0,
+                step=10.0,
+                help="Expected return on trade spend investment"
+            )
     
-    output.seek(0)
-    return output
+    st.markdown("---")
+    
+    if st.button("🔍 Run Analysis", type="primary", use_container_width=True):
+        if not product_group:
+            st.error("⚠️ Please select at least one product group")
+        elif promo_start >= promo_end:
+            st.error("⚠️ End date must be after start date")
+        else:
+            with st.spinner("Analyzing promotion performance..."):
+                try:
+                    st.session_state.current_analysis = run_analysis(
+                        sales_index, retailer, product_group, promo_start, promo_end,
+                        trade_spend, flat_fee, gross_margin_pct, expected_lift, expected_roi,
+                        baseline, int(baseline_weeks), BOOTSTRAP_DRAWS if with_intervals else 0
+                    )
+                except ValueError as e:
+                    st.error(f"⚠️ {str(e)}")
+    
+    # Drawn in this same fragment run, so a new analysis shows without a full rerun
+    analysis_results(analysis_store)
+
+@st.fragment
+def analysis_results(analysis_store):
+    """Results of the current analysis; notes and what-if inputs rerun only this fragment"""
+    if st.session_state.current_analysis:
+        st.success("✅ Analysis Complete")
+        st.markdown("---")
+        
+        a = st.session_state.current_analysis
+        
+        st.markdown("## 📊 Performance Results")
+        
+        # Period comparison cards
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            baseline_title, baseline_span = baseline_label(a)
+            st.markdown(f"""<div class='period-card pre'>
+            <h3 style='color: #64748b; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>{baseline_title}</h3>
+            <p style='color: #94a3b8; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{baseline_span}</p>
+            </div>""", unsafe_allow_html=True)
+            st.metric("Sales", f"${a['pre_sales']:,.0f}")
+            st.caption("Baseline performance")
+            st.metric("Units", f"{a['pre_units']:,.0f}")
+        
+        with col2:
+            st.markdown(f"""<div class='period-card during'>
+            <h3 style='color: #7cb342; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>During Promotion</h3>
+            <p style='color: #8bc34a; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{a['periods']['promo_start'].strftime('%b %d')} - {a['periods']['promo_end'].strftime('%b %d, %Y')}</p>
+            </div>""", unsafe_allow_html=True)
+            st.metric("Sales", f"${a['promo_sales']:,.0f}", delta=f"+${a['promo_sales'] - a['pre_sales']:,.0f}")
+            st.caption(f"Incremental: ${a['promo_sales'] - a['pre_sales']:,.0f}")
+            st.metric("Units", f"{a['promo_units']:,.0f}")
+        
+        with col3:
+            st.markdown(f"""<div class='period-card post'>
+            <h3 style='color: #e57b8f; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>Post-Promo</h3>
+            <p style='color: #f48ba7; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{a['periods']['post_start'].strftime('%b %d')} - {a['periods']['post_end'].strftime('%b %d, %Y')}</p>
+            </div>""", unsafe_allow_html=True)
+            st.metric("Sales", f"${a['post_sales']:,.0f}", delta=f"+${a['post_sales'] - a['pre_sales']:,.0f}")
+            st.caption(f"Incremental: ${a['post_sales'] - a['pre_sales']:,.0f}")
+            st.metric("Units", f"{a['post_units']:,.0f}")
+        
+        st.markdown("---")
+        
+        # Trade Spend Breakdown Section
+        st.markdown("### 💰 Trade Spend Breakdown")
+        
+        breakdown_col1, breakdown_col2 = st.columns(2)
+        
+        with breakdown_col1:
+            st.metric("Item-Level Trade Spend", f"${a['trade_spend']:,.0f}")
+            st.caption("Promotional discounts and allowances")
+            
+            st.metric("Additional Fees", f"${a['flat_fee']:,.0f}")
+            st.caption("Slotting, display, co-op advertising")
+            
+            if a['metrics']['edlp_spend'] > 0:
+                st.metric("EDLP Spend", f"${a['metrics']['edlp_spend']:,.0f}")
+                st.caption(f"Everyday discount: {a['promo_units']:,.0f} units sold")
+        
+        with breakdown_col2:
+            total_investment = a['trade_spend'] + a['flat_fee'] + a['metrics']['edlp_spend']
+            st.metric("**Total Trade Investment**", f"**${total_investment:,.0f}**")
+            st.caption("Sum of all trade spend components")
+            
+            # Show percentage breakdown
+            if total_investment > 0:
+                st.markdown("**Breakdown:**")
+                promo_pct = (a['trade_spend'] / total_investment * 100) if total_investment > 0 else 0
+                fee_pct = (a['flat_fee'] / total_investment * 100) if total_investment > 0 else 0
+                edlp_pct = (a['metrics']['edlp_spend'] / total_investment * 100) if total_investment > 0 else 0
+                
+                st.write(f"• Promo: {promo_pct:.1f}%")
+                st.write(f"• Fees: {fee_pct:.1f}%")
+                if a['metrics']['edlp_spend'] > 0:
+                    st.write(f"• EDLP: {edlp_pct:.1f}%")
+        
+        st.markdown("---")
+        
+        # Metrics section
+        intervals = a.get('intervals')
+        if 'intervals' in a and intervals is None:
+            st.info("Not enough non-promo history for confidence intervals")
+        col1, col2 = st.columns([1, 1])
+        
+        with col1:
+            st.markdown("### 📈 Lift Analysis")
+            
+            st.markdown("**Unit Lift**")
+            during_diff = a['metrics']['during_lift'] - a['expected_lift']
+            st.metric("During Promo", f"{a['metrics']['during_lift']:.1f}%", f"{during_diff:+.1f}%")
+            if intervals:
+                st.caption(f"{intervals['confidence']:.0f}% CI: {intervals['during_lift'][0]:.1f}% to {intervals['during_lift'][1]:.1f}%")
+            st.metric("Post Promo", f"{a['metrics']['post_lift']:.1f}%")
+            if intervals:
+                st.caption(f"{intervals['confidence']:.0f}% CI: {intervals['post_lift'][0]:.1f}% to {intervals['post_lift'][1]:.1f}%")
+            
+            st.markdown("---")
+            
+            st.markdown("**Dollar Lift**")
+            dollar_during_lift = ((a['promo_sales'] - a['pre_sales']) / a['pre_sales'] * 100) if a['pre_sales'] > 0 else 0
+            dollar_post_lift = ((a['post_sales'] - a['pre_sales']) / a['pre_sales'] * 100) if a['pre_sales'] > 0 else 0
+            st.metric("During Promo", f"{dollar_during_lift:.1f}%")
+            st.metric("Post Promo", f"{dollar_post_lift:.1f}%")
+            
+            st.markdown("---")
+            st.metric("Expected Lift", f"{a['expected_lift']:.1f}%")
+            st.caption("Unit-based expectation")
+        
+        with col2:
+            st.markdown("### 💵 Financial Performance")
+            roi_diff = a['metrics']['roi'] - a['expected_roi']
+            st.metric("Actual ROI", f"{a['metrics']['roi']:.1f}%", f"{roi_diff:+.1f}%")
+            if intervals:
+                st.caption(f"{intervals['confidence']:.0f}% CI: {intervals['roi'][0]:.1f}% to {intervals['roi'][1]:.1f}%")
+            st.metric("Expected ROI", f"{a['expected_roi']:.1f}%")
+            
+            st.markdown("---")
+            st.metric("Incremental Revenue", f"${a['metrics']['incremental_sales']:,.0f}")
+            st.metric("Incremental Profit", f"${a['metrics']['incremental_profit']:,.0f}")
+            st.caption(f"Based on {a['gross_margin_pct']:.0f}% gross margin")
+        
+        st.markdown("---")
+        
+        # Charts
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(create_performance_chart(a['pre_sales'], a['promo_sales'], a['post_sales']), use_container_width=True)
+        with col2:
+            st.plotly_chart(create_lift_gauge(a['metrics']['during_lift'], a['expected_lift']), use_container_width=True)
+        
+        with st.expander("🎛️ What-If Sensitivity"):
+            st.caption("ROI across gross margin and trade spend changes, using this promotion's sales")
+            what_if_col1, what_if_col2, what_if_col3 = st.columns(3)
+            with what_if_col1:
+                margin_range = st.slider(
+                    "Gross Margin Range (%)", 0.0, 100.0,
+                    (max(a['gross_margin_pct'] - 10.0, 0.0), min(a['gross_margin_pct'] + 10.0, 100.0))
+                )
+            with what_if_col2:
+                spend_range = st.slider("Trade Spend Change (%)", -100, 200, (-30, 30))
+            with what_if_col3:
+                grid_steps = st.slider("Grid Steps", 11, 201, 101, help="Points along each axis")
+            what_if_fee = st.number_input("What-If Additional Fees ($)", 0.0, value=float(a['flat_fee']), step=100.0)
+            what_if_value = st.radio(
+                "Show", ['roi', 'incremental_profit'], horizontal=True,
+                format_func={'roi': 'ROI', 'incremental_profit': 'Incremental Profit'}.get
+            )
+            grid = sensitivity_grid(
+                {**a, 'flat_fee': what_if_fee},
+                np.linspace(*margin_range, grid_steps),
+                np.linspace(*spend_range, grid_steps)
+            )
+            st.plotly_chart(create_sensitivity_heatmap(grid, what_if_value), use_container_width=True)
+        
+        st.markdown("---")
+        
+        # Notes section
+        st.markdown("### 📝 Analysis Notes")
+        notes = st.text_area(
+            "Document key insights and recommendations",
+            height=120,
+            placeholder="e.g., Strong performance during promo but post-promo dip indicates forward buying..."
+        )
+        
+        if st.button("💾 Save Analysis", type="primary", use_container_width=True):
+            a['notes'] = notes
+            a['analysis_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            analysis_store.save(a)
+            st.session_state.current_analysis = None
+            st.success("✅ Analysis saved successfully!")
+            # Full rerun so the sidebar count and All Analyses tab pick up the save
+            st.rerun(scope="app")
 
 def main():
     # Header
@@ -710,54 +862,115 @@ def main():
         
         uploaded_file = st.file_uploader(
             "Upload Weekly Sales Data",
-            type=['xlsx', 'xls'],
-            help="Upload syndicated weekly sales data"
+            type=['xlsx', 'xls', 'csv', 'parquet'],
+            help="Upload syndicated weekly sales data (Excel, or CSV/Parquet for large extracts)"
         )
         
+        current_weekly_store(uploaded_file)
         if uploaded_file:
-            if st.session_state.weekly_data is None:
+            if st.session_state.weekly_store is None:
                 with st.spinner("Loading..."):
-                    st.session_state.weekly_data = load_weekly_data(uploaded_file)
-                    if st.session_state.weekly_data is not None:
-                        st.success(f"✅ {len(st.session_state.weekly_data):,} rows loaded")
+                    st.session_state.weekly_store = ingest_upload(uploaded_file)
+                    if st.session_state.weekly_store is not None:
+                        get_sales_index(st.session_state.weekly_store).cube()
+                        st.success(f"✅ {read_store_manifest(st.session_state.weekly_store)['rows']:,} rows loaded")
             else:
-                st.success(f"✅ {len(st.session_state.weekly_data):,} rows loaded")
+                st.success(f"✅ {read_store_manifest(st.session_state.weekly_store)['rows']:,} rows loaded")
                 if st.button("🔄 Reload Data", use_container_width=True):
-                    st.session_state.weekly_data = load_weekly_data(uploaded_file)
+                    st.session_state.weekly_store = ingest_upload(uploaded_file)
                     st.rerun()
+                
+                delta_file = st.file_uploader(
+                    "Append Weekly Delta",
+                    type=['xlsx', 'xls', 'csv', 'parquet'],
+                    help="Latest week(s) from the vendor; re-delivered weeks replace the existing rows"
+                )
+                if delta_file and st.button("➕ Append Delta", use_container_width=True):
+                    with st.spinner("Appending..."):
+                        appended_store = append_upload(st.session_state.weekly_store, delta_file)
+                    if appended_store is not None:
+                        st.session_state.weekly_store = appended_store
+                        st.rerun()
+        
+        if st.session_state.weekly_store is not None:
+            report = read_store_manifest(st.session_state.weekly_store).get('metadata', {}).get('memory_report')
+            if report:
+                with st.expander("Memory Footprint", expanded=False):
+                    st.caption("Bytes per column as loaded vs. after compaction")
+                    st.dataframe(
+                        [{'Column': col, 'Loaded': f"{sizes['before']:,}", 'Compacted': f"{sizes['after']:,}"} for col, sizes in report.items()],
+                        use_container_width=True,
+                        hide_index=True
+                    )
+                    before = sum(sizes['before'] for sizes in report.values())
+                    after = sum(sizes['after'] for sizes in report.values())
+                    st.metric("Total", f"{after / 1e6:,.1f} MB", f"-{(1 - after / before) * 100:.0f}%" if before else None, delta_color="inverse")
         
         st.markdown("---")
         st.markdown("## ⚙️ EDLP Rates")
         
         with st.expander("View Configured EDLP Rates", expanded=False):
-            st.caption("Everyday low price discount rates applied per unit sold")
+            st.caption("Everyday low price discount rates applied per unit sold, as of today")
             
-            if EDLP_RATES:
-                for retailer, products in list(EDLP_RATES.items())[:5]:  # Show first 5
+            try:
+                edlp_rates = current_edlp_rates()
+            except Exception as e:
+                st.error(f"Error loading EDLP rates: {str(e)}")
+                edlp_rates = {}
+            if edlp_rates:
+                for retailer, products in list(edlp_rates.items())[:5]:  # Show first 5
                     st.markdown(f"**{retailer}:**")
                     for product, rate in list(products.items())[:3]:  # Show first 3 products
                         st.write(f"  • {product}: ${rate:.2f}/unit")
-                st.caption(f"...and {len(EDLP_RATES) - 5} more retailers configured")
+                st.caption(f"...and {max(len(edlp_rates) - 5, 0)} more retailers configured")
             else:
                 st.info("No EDLP rates configured")
+            st.caption(f"Rate table: {EDLP_RATES_PATH}")
         
         st.markdown("---")
         st.markdown("## 📊 Analysis Summary")
-        st.metric("Total Analyses", len(st.session_state.promo_analyses))
+        analysis_store = get_analysis_store()
+        total_analyses = analysis_store.count()
+        st.metric("Total Analyses", total_analyses)
         
-        if st.session_state.promo_analyses:
+        if total_analyses:
+            export_formats = {"Excel": None, "Parquet": 'parquet', "CSV": 'csv', "NDJSON": 'ndjson'}
+            export_format = st.selectbox(
+                "Export Format",
+                list(export_formats),
+                help="Parquet, CSV and NDJSON are flat tables for BI tools"
+            )
+            weekly_detail = st.checkbox(
+                "Include weekly detail",
+                disabled=st.session_state.weekly_store is None,
+                help="Add the prorated weekly rows behind each analysis (needs the sales data loaded)"
+            )
             if st.button("📥 Export All", use_container_width=True):
-                excel_data = export_to_excel(st.session_state.promo_analyses)
-                st.download_button(
-                    "⬇️ Download Excel",
-                    excel_data,
-                    f"promo_analyses_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
+                sales_index = get_sales_index(st.session_state.weekly_store) if weekly_detail and st.session_state.weekly_store else None
+                stamp = datetime.now().strftime('%Y%m%d')
+                fmt = export_formats[export_format]
+                if fmt is None:
+                    excel_data = export_to_excel(analysis_store.query(), sales_index)
+                    st.download_button(
+                        "⬇️ Download Excel",
+                        excel_data,
+                        f"promo_analyses_{stamp}.xlsx",
+                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        use_container_width=True
+                    )
+                else:
+                    files = export_columnar(analysis_store.query(), fmt, sales_index)
+                    for name, data in files.items():
+                        st.download_button(
+                            f"⬇️ Download {name.replace('_', ' ').title()} ({export_format})",
+                            data,
+                            f"promo_{name}_{stamp}{COLUMNAR_FORMATS[fmt]}",
+                            "application/octet-stream" if fmt == 'parquet' else "text/plain",
+                            use_container_width=True
+                        )
     
     # Main content
-    if st.session_state.weekly_data is None:
+    if st.session_state.weekly_store is None:
         st.info("👈 Upload your weekly sales data to begin analysis")
         
         st.markdown("<br>", unsafe_allow_html=True)
@@ -787,329 +1000,297 @@ def main():
             </div>
             """, unsafe_allow_html=True)
     else:
-        tab1, tab2 = st.tabs(["➕ New Analysis", "📋 All Analyses"])
+        tab1, tab_batch, tab2 = st.tabs(["➕ New Analysis", "🗓️ Batch Calendar", "📋 All Analyses"])
+        sales_index = get_sales_index(st.session_state.weekly_store)
         
         with tab1:
-            df = st.session_state.weekly_data
-            retailers = sorted(df['GEOGRAPHY'].dropna().unique())
-            product_groups = sorted(df['Product Group'].dropna().unique())
-            
-            st.markdown("## 🎯 Promotion Configuration")
-            
-            col1, col2 = st.columns([1, 1])
+            new_analysis_form(sales_index, analysis_store)
+        
+        with tab_batch:
+            st.markdown("## 🗓️ Promo Calendar")
+            st.caption(
+                f"Required columns: {', '.join(CALENDAR_REQUIRED_COLUMNS)}. "
+                f"Optional: {', '.join(CALENDAR_OPTIONAL_COLUMNS)}. "
+                "Separate multiple product groups with commas."
+            )
             
-            with col1:
-                st.markdown("### Product & Retailer")
-                retailer = st.selectbox("Retailer", retailers)
-                product_group = st.multiselect("Product Group(s)", product_groups, help="Select one or more product groups")
+            with st.expander("🔎 Detect Promotions", expanded=st.session_state.detected_promos is not None):
+                st.caption("Scan every retailer and product group for weeks where units jump above their trailing median.")
+                detect_col1, detect_col2 = st.columns(2)
+                with detect_col1:
+                    min_lift_pct = st.number_input("Minimum Unit Lift (%)", 5.0, 1000.0, DETECT_MIN_LIFT_PCT, step=5.0)
+                with detect_col2:
+                    baseline_weeks = st.number_input("Baseline Weeks", 2, 52, DETECT_BASELINE_WEEKS)
                 
-                st.markdown("### Timing")
-                date_col1, date_col2 = st.columns(2)
-                with date_col1:
-                    promo_start = st.date_input("Promo Start Date")
-                with date_col2:
-                    promo_end = st.date_input("Promo End Date")
-            
-            with col2:
-                st.markdown("### Financial Inputs")
-                trade_spend = st.number_input(
-                    "Item-Level Trade Spend ($)",
-                    0.0,
-                    step=100.0,
-                    help="Total promotional trade spend: discounts, off-invoice, scan-based allowances (EDLP rates auto-applied from config)"
-                )
+                if st.button("🔎 Scan All Series", use_container_width=True):
+                    with st.spinner("Scanning weekly velocity..."):
+                        st.session_state.detected_promos = detect_promo_windows(
+                            sales_index, min_lift_pct, int(baseline_weeks)
+                        )
                 
-                # Show EDLP info if configured
-                if retailer and product_group:
-                    edlp_info = []
-                    for pg in product_group:
-                        rate = get_edlp_rate(retailer, pg)
-                        if rate > 0:
-                            edlp_info.append(f"{pg}: ${rate:.2f}/unit")
-                    if edlp_info:
-                        st.info(f"💡 **EDLP rates configured:**\n\n" + "\n\n".join(edlp_info) + "\n\n*Applied automatically to all units sold*")
-                
-                flat_fee = st.number_input(
-                    "Additional Fees ($)",
-                    0.0,
-                    step=100.0,
-                    help="Slotting fees, display fees, co-op advertising"
+                detected = st.session_state.detected_promos
+                if detected is not None:
+                    if detected.empty:
+                        st.info("No promotions detected at this threshold")
+                    else:
+                        st.dataframe(detected, use_container_width=True, hide_index=True)
+                        pick = st.selectbox(
+                            "Detected Promotion",
+                            detected.index,
+                            format_func=lambda i: (
+                                f"{detected.at[i, 'Retailer']} | {detected.at[i, 'Product Group']} | "
+                                f"{detected.at[i, 'Promo Start']:%m/%d/%Y} - {detected.at[i, 'Promo End']:%m/%d/%Y}"
+                            )
+                        )
+                        pick_col1, pick_col2 = st.columns(2)
+                        with pick_col1:
+                            st.button(
+                                "➕ Open in New Analysis", use_container_width=True,
+                                on_click=prefill_analysis_form, args=(detected.loc[pick],)
+                            )
+                        with pick_col2:
+                            st.button(
+                                f"🗓️ Queue All {len(detected):,} for Batch", use_container_width=True,
+                                on_click=queue_detections, args=(detected,)
+                            )
+            
+            calendar_file = st.file_uploader(
+                "Upload Promo Calendar",
+                type=['csv', 'xlsx', 'xls'],
+                help="One row per promotion with trade spend, fees, margin and expectations"
+            )
+            
+            batch_col1, batch_col2 = st.columns(2)
+            with batch_col1:
+                batch_baseline = st.selectbox(
+                    "Default Baseline",
+                    list(BASELINE_METHODS),
+                    format_func=BASELINE_METHODS.get,
+                    key='batch_baseline',
+                    help="Used for calendar rows with a blank Baseline column"
                 )
-                gross_margin_pct = st.number_input(
-                    "Gross Margin (%)",
-                    0.0,
-                    100.0,
-                    30.0,
-                    step=5.0,
-                    help="Gross margin = (Net Price - COGS) / Net Price × 100"
+            with batch_col2:
+                batch_baseline_weeks = st.number_input(
+                    "Trailing Weeks", 2, 52, BASELINE_WEEKS, key='batch_baseline_weeks',
+                    help="Weeks in the trailing median baseline"
                 )
-                
-                st.markdown("### Performance Expectations")
-                exp_col1, exp_col2 = st.columns(2)
-                with exp_col1:
-                    expected_lift = st.number_input("Expected Lift (%)", 0.0, step=5.0)
-                with exp_col2:
-                    expected_roi = st.number_input(
-                        "Expected ROI (%)",
-                        -100.0,
-                        step=10.0,
-                        help="Expected return on trade spend investment"
-                    )
             
-            st.markdown("---")
+            max_workers = st.number_input(
+                "Worker Processes",
+                1,
+                os.cpu_count() or 1,
+                1,
+                help=f"Calendars with {BATCH_PARALLEL_MIN_ROWS:,}+ rows are split by retailer across this many processes; smaller ones run faster in this process"
+            )
             
-            if st.button("🔍 Run Analysis", type="primary", use_container_width=True):
-                if not product_group:
-                    st.error("⚠️ Please select at least one product group")
-                elif promo_start >= promo_end:
-                    st.error("⚠️ End date must be after start date")
+            queued = None
+            if calendar_file is None and st.session_state.batch_calendar is not None:
+                st.markdown(f"**{len(st.session_state.batch_calendar):,} detected promotion(s) queued** - fill in spend before running")
+                queued = st.data_editor(st.session_state.batch_calendar, use_container_width=True, hide_index=True)
+                if st.button("✖️ Clear Queue"):
+                    st.session_state.batch_calendar = None
+                    st.rerun()
+            
+            if (calendar_file or queued is not None) and st.button("🔍 Run Batch Analysis", type="primary", use_container_width=True):
+                try:
+                    if calendar_file:
+                        calendar = read_promo_calendar(calendar_file, calendar_file.name)
+                    else:
+                        calendar = normalize_promo_calendar(queued)
+                except Exception as e:
+                    st.error(f"Error loading calendar: {str(e)}")
                 else:
-                    with st.spinner("Analyzing promotion performance..."):
-                        periods = calculate_promo_periods(promo_start, promo_end)
-                        
-                        pre_sales, pre_units = get_period_sales(df, retailer, product_group, periods['pre_start'], periods['pre_end'], periods['promo_days'])
-                        promo_sales, promo_units = get_period_sales(df, retailer, product_group, periods['promo_start'], periods['promo_end'], periods['promo_days'])
-                        post_sales, post_units = get_period_sales(df, retailer, product_group, periods['post_start'], periods['post_end'], periods['promo_days'])
-                        
-                        # Calculate EDLP spend for promo period
-                        edlp_spend = calculate_edlp_spend(retailer, product_group, promo_units)
-                        
-                        metrics = calculate_metrics(pre_sales, promo_sales, post_sales, trade_spend, flat_fee, pre_units, promo_units, post_units, gross_margin_pct, edlp_spend)
-                        product_group_display = ', '.join(product_group) if isinstance(product_group, list) else product_group
-                        
-                        st.session_state.current_analysis = {
-                            'retailer': retailer,
-                            'product_group': product_group,
-                            'product_group_display': product_group_display,
-                            'periods': periods,
-                            'pre_sales': pre_sales,
-                            'promo_sales': promo_sales,
-                            'post_sales': post_sales,
-                            'pre_units': pre_units,
-                            'promo_units': promo_units,
-                            'post_units': post_units,
-                            'trade_spend': trade_spend,
-                            'flat_fee': flat_fee,
-                            'gross_margin_pct': gross_margin_pct,
-                            'expected_lift': expected_lift,
-                            'expected_roi': expected_roi,
-                            'metrics': metrics
-                        }
-                        st.rerun()
+                    with st.spinner(f"Analyzing {len(calendar):,} promotions..."):
+                        try:
+                            if max_workers > 1 and len(calendar) >= BATCH_PARALLEL_MIN_ROWS:
+                                st.session_state.batch_results = run_promo_batch_parallel(
+                                    st.session_state.weekly_store, calendar, int(max_workers),
+                                    batch_baseline, int(batch_baseline_weeks)
+                                )
+                            else:
+                                st.session_state.batch_results = run_promo_batch(
+                                    sales_index, calendar, batch_baseline, int(batch_baseline_weeks)
+                                )
+                        except ValueError as e:
+                            st.error(f"⚠️ {str(e)}")
             
-            if st.session_state.current_analysis:
-                st.success("✅ Analysis Complete")
-                st.markdown("---")
-                
-                a = st.session_state.current_analysis
-                
-                st.markdown("## 📊 Performance Results")
-                
-                # Period comparison cards
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.markdown(f"""<div class='period-card pre'>
-                    <h3 style='color: #64748b; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>Pre-Promo Baseline</h3>
-                    <p style='color: #94a3b8; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{a['periods']['pre_start'].strftime('%b %d')} - {a['periods']['pre_end'].strftime('%b %d, %Y')}</p>
-                    </div>""", unsafe_allow_html=True)
-                    st.metric("Sales", f"${a['pre_sales']:,.0f}")
-                    st.caption("Baseline performance")
-                    st.metric("Units", f"{a['pre_units']:,.0f}")
+            if st.session_state.batch_results is not None:
+                results = st.session_state.batch_results
+                issues = int((results['Issue'] != '').sum())
+                st.success(f"✅ {len(results) - issues:,} promotions analyzed")
+                if issues:
+                    st.warning(f"⚠️ {issues:,} row(s) could not be analyzed - see the Issue column")
+                st.dataframe(results, use_container_width=True, hide_index=True)
                 
-                with col2:
-                    st.markdown(f"""<div class='period-card during'>
-                    <h3 style='color: #7cb342; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>During Promotion</h3>
-                    <p style='color: #8bc34a; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{a['periods']['promo_start'].strftime('%b %d')} - {a['periods']['promo_end'].strftime('%b %d, %Y')}</p>
-                    </div>""", unsafe_allow_html=True)
-                    st.metric("Sales", f"${a['promo_sales']:,.0f}", delta=f"+${a['promo_sales'] - a['pre_sales']:,.0f}")
-                    st.caption(f"Incremental: ${a['promo_sales'] - a['pre_sales']:,.0f}")
-                    st.metric("Units", f"{a['promo_units']:,.0f}")
-                
-                with col3:
-                    st.markdown(f"""<div class='period-card post'>
-                    <h3 style='color: #e57b8f; margin:0; font-size: 1rem; font-weight: 600; text-transform: uppercase; letter-spacing: 0.05em;'>Post-Promo</h3>
-                    <p style='color: #f48ba7; font-size: 0.875rem; margin: 0.25rem 0 1rem 0;'>{a['periods']['post_start'].strftime('%b %d')} - {a['periods']['post_end'].strftime('%b %d, %Y')}</p>
-                    </div>""", unsafe_allow_html=True)
-                    st.metric("Sales", f"${a['post_sales']:,.0f}", delta=f"+${a['post_sales'] - a['pre_sales']:,.0f}")
-                    st.caption(f"Incremental: ${a['post_sales'] - a['pre_sales']:,.0f}")
-                    st.metric("Units", f"{a['post_units']:,.0f}")
-                
-                st.markdown("---")
-                
-                # Trade Spend Breakdown Section
-                st.markdown("### 💰 Trade Spend Breakdown")
-                
-                breakdown_col1, breakdown_col2 = st.columns(2)
-                
-                with breakdown_col1:
-                    st.metric("Item-Level Trade Spend", f"${a['trade_spend']:,.0f}")
-                    st.caption("Promotional discounts and allowances")
-                    
-                    st.metric("Additional Fees", f"${a['flat_fee']:,.0f}")
-                    st.caption("Slotting, display, co-op advertising")
-                    
-                    if a['metrics']['edlp_spend'] > 0:
-                        st.metric("EDLP Spend", f"${a['metrics']['edlp_spend']:,.0f}")
-                        st.caption(f"Everyday discount: {a['promo_units']:,.0f} units sold")
-                
-                with breakdown_col2:
-                    total_investment = a['trade_spend'] + a['flat_fee'] + a['metrics']['edlp_spend']
-                    st.metric("**Total Trade Investment**", f"**${total_investment:,.0f}**")
-                    st.caption("Sum of all trade spend components")
-                    
-                    # Show percentage breakdown
-                    if total_investment > 0:
-                        st.markdown("**Breakdown:**")
-                        promo_pct = (a['trade_spend'] / total_investment * 100) if total_investment > 0 else 0
-                        fee_pct = (a['flat_fee'] / total_investment * 100) if total_investment > 0 else 0
-                        edlp_pct = (a['metrics']['edlp_spend'] / total_investment * 100) if total_investment > 0 else 0
-                        
-                        st.write(f"• Promo: {promo_pct:.1f}%")
-                        st.write(f"• Fees: {fee_pct:.1f}%")
-                        if a['metrics']['edlp_spend'] > 0:
-                            st.write(f"• EDLP: {edlp_pct:.1f}%")
-                
-                st.markdown("---")
-                
-                # Metrics section
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    st.markdown("### 📈 Lift Analysis")
-                    
-                    st.markdown("**Unit Lift**")
-                    during_diff = a['metrics']['during_lift'] - a['expected_lift']
-                    st.metric("During Promo", f"{a['metrics']['during_lift']:.1f}%", f"{during_diff:+.1f}%")
-                    st.metric("Post Promo", f"{a['metrics']['post_lift']:.1f}%")
-                    
-                    st.markdown("---")
-                    
-                    st.markdown("**Dollar Lift**")
-                    dollar_during_lift = ((a['promo_sales'] - a['pre_sales']) / a['pre_sales'] * 100) if a['pre_sales'] > 0 else 0
-                    dollar_post_lift = ((a['post_sales'] - a['pre_sales']) / a['pre_sales'] * 100) if a['pre_sales'] > 0 else 0
-                    st.metric("During Promo", f"{dollar_during_lift:.1f}%")
-                    st.metric("Post Promo", f"{dollar_post_lift:.1f}%")
-                    
-                    st.markdown("---")
-                    st.metric("Expected Lift", f"{a['expected_lift']:.1f}%")
-                    st.caption("Unit-based expectation")
-                
-                with col2:
-                    st.markdown("### 💵 Financial Performance")
-                    roi_diff = a['metrics']['roi'] - a['expected_roi']
-                    st.metric("Actual ROI", f"{a['metrics']['roi']:.1f}%", f"{roi_diff:+.1f}%")
-                    st.metric("Expected ROI", f"{a['expected_roi']:.1f}%")
-                    
-                    st.markdown("---")
-                    st.metric("Incremental Revenue", f"${a['metrics']['incremental_sales']:,.0f}")
-                    st.metric("Incremental Profit", f"${a['metrics']['incremental_profit']:,.0f}")
-                    st.caption(f"Based on {a['gross_margin_pct']:.0f}% gross margin")
-                
-                st.markdown("---")
-                
-                # Charts
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.plotly_chart(create_performance_chart(a['pre_sales'], a['promo_sales'], a['post_sales']), use_container_width=True)
-                with col2:
-                    st.plotly_chart(create_lift_gauge(a['metrics']['during_lift'], a['expected_lift']), use_container_width=True)
-                
-                st.markdown("---")
-                
-                # Notes section
-                st.markdown("### 📝 Analysis Notes")
-                notes = st.text_area(
-                    "Document key insights and recommendations",
-                    height=120,
-                    placeholder="e.g., Strong performance during promo but post-promo dip indicates forward buying..."
-                )
-                
-                if st.button("💾 Save Analysis", type="primary", use_container_width=True):
-                    a['notes'] = notes
-                    a['analysis_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    st.session_state.promo_analyses.append(a.copy())
-                    st.session_state.current_analysis = None
-                    st.success("✅ Analysis saved successfully!")
+                if st.button("💾 Save All to Analyses", type="primary", use_container_width=True):
+                    analysis_store.save_many(batch_results_to_analyses(results))
+                    st.session_state.batch_results = None
                     st.rerun()
         
         with tab2:
             st.markdown("## 📋 Saved Analyses")
             
-            if not st.session_state.promo_analyses:
+            if not total_analyses:
                 st.info("No saved analyses yet. Create your first analysis in the 'New Analysis' tab!")
             else:
+                filter_col1, filter_col2, filter_col3 = st.columns(3)
+                with filter_col1:
+                    filter_retailer = st.selectbox("Retailer Filter", ["All Retailers"] + analysis_store.retailers())
+                with filter_col2:
+                    filter_group = st.selectbox("Product Group Filter", ["All Product Groups"] + analysis_store.product_groups())
+                with filter_col3:
+                    search = st.text_input("Search", placeholder="Retailer or product group")
+                filters = {
+                    'retailer': None if filter_retailer == "All Retailers" else filter_retailer,
+                    'product_group': None if filter_group == "All Product Groups" else filter_group,
+                    'search': search.strip() or None
+                }
+                summary = analysis_store.summary(**filters)
+                
                 # Summary metrics
                 col1, col2, col3, col4 = st.columns(4)
                 
-                avg_lift = sum(a['metrics']['during_lift'] for a in st.session_state.promo_analyses) / len(st.session_state.promo_analyses)
-                avg_roi = sum(a['metrics']['roi'] for a in st.session_state.promo_analyses) / len(st.session_state.promo_analyses)
-                total_spend = sum(a['trade_spend'] + a['flat_fee'] + a['metrics']['edlp_spend'] for a in st.session_state.promo_analyses)
-                total_incremental = sum(a['metrics']['incremental_sales'] for a in st.session_state.promo_analyses)
-                
                 with col1:
-                    st.metric("Average Lift", f"{avg_lift:.1f}%")
+                    st.metric("Average Lift", f"{summary['avg_lift']:.1f}%")
                 with col2:
-                    st.metric("Average ROI", f"{avg_roi:.1f}%")
+                    st.metric("Average ROI", f"{summary['avg_roi']:.1f}%")
                 with col3:
-                    st.metric("Total Investment", f"${total_spend:,.0f}")
+                    st.metric("Total Investment", f"${summary['total_spend']:,.0f}")
                 with col4:
-                    st.metric("Total Incremental", f"${total_incremental:,.0f}")
+                    st.metric("Total Incremental", f"${summary['total_incremental']:,.0f}")
+                
+                with st.expander("📊 Portfolio Rollup", expanded=False):
+                    # Fix any level to drill down; rows break out the first level left at "All"
+                    drill = {}
+                    drill_cols = st.columns(len(ROLLUP_LEVELS))
+                    for drill_col, level in zip(drill_cols, ROLLUP_LEVELS):
+                        with drill_col:
+                            choice = st.selectbox(level, ["All"] + analysis_store.rollup_values(level, **drill), key=f"rollup_{level}")
+                        drill[ROLLUP_LEVELS[level]] = None if choice == "All" else choice
+                    open_levels = [level for level in ROLLUP_LEVELS if drill[ROLLUP_LEVELS[level]] is None]
+                    group_by = open_levels[:1] or list(ROLLUP_LEVELS)
+                    rollup = analysis_store.rollup(group_by, **drill)
+                    
+                    if rollup.empty:
+                        st.info("No saved analyses in this slice.")
+                    else:
+                        st.dataframe(
+                            rollup,
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                'Total Spend': st.column_config.NumberColumn(format="dollar"),
+                                'Incremental Sales': st.column_config.NumberColumn(format="dollar"),
+                                'Incremental Profit': st.column_config.NumberColumn(format="dollar"),
+                                'ROI %': st.column_config.NumberColumn(format="%.1f%%"),
+                                'Avg Lift %': st.column_config.NumberColumn(format="%.1f%%"),
+                                'Avg ROI %': st.column_config.NumberColumn(format="%.1f%%")
+                            }
+                        )
+                        st.caption("ROI % pools every dollar of spend in a row; Avg Lift % and Avg ROI % average its analyses")
+                        if open_levels and len(rollup) > 1:
+                            st.plotly_chart(create_rollup_chart(rollup, group_by[0]), use_container_width=True)
                 
                 st.markdown("---")
                 
-                # Individual analysis cards
-                for idx, a in enumerate(st.session_state.promo_analyses):
-                    if isinstance(a['product_group'], list):
-                        product_display = ', '.join(a['product_group'])
-                    else:
-                        product_display = str(a['product_group'])
+                pages = max((summary['count'] - 1) // ANALYSIS_PAGE_SIZE + 1, 1)
+                sort_col1, sort_col2, sort_col3 = st.columns([2, 1, 1])
+                with sort_col1:
+                    sort = st.selectbox("Sort By", list(ANALYSIS_SORT_COLUMNS))
+                with sort_col2:
+                    descending = st.selectbox("Order", ["Descending", "Ascending"]) == "Descending"
+                with sort_col3:
+                    page = st.number_input("Page", 1, pages, 1)
+                
+                # One page of the indexed columns; full records load only for the selected row
+                table = analysis_store.table(ANALYSIS_PAGE_SIZE, (page - 1) * ANALYSIS_PAGE_SIZE, sort, descending, **filters)
+                selection = st.dataframe(
+                    table,
+                    use_container_width=True,
+                    hide_index=True,
+                    on_select="rerun",
+                    selection_mode="single-row",
+                    column_config={
+                        'Promo Start': st.column_config.DateColumn(format="MMM DD, YYYY"),
+                        'Promo End': st.column_config.DateColumn(format="MMM DD, YYYY"),
+                        'During Lift %': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Post Lift %': st.column_config.NumberColumn(format="%.1f%%"),
+                        'ROI %': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Total Spend': st.column_config.NumberColumn(format="dollar"),
+                        'Incremental Sales': st.column_config.NumberColumn(format="dollar"),
+                        'Incremental Profit': st.column_config.NumberColumn(format="dollar")
+                    }
+                )
+                st.caption(f"{summary['count']:,} analyses • page {page} of {pages} • select a row for details")
+                
+                if len(table) > 1:
+                    with st.expander("📈 Compare This Page", expanded=False):
+                        # One figure for the whole page, cached on its values
+                        labels = tuple(
+                            f"{retailer} • {groups} • {start:%b %d, %Y} (#{analysis_id})"
+                            for analysis_id, retailer, groups, start in zip(
+                                table.index, table['Retailer'], table['Product Group(s)'], table['Promo Start']
+                            )
+                        )
+                        st.plotly_chart(
+                            create_comparison_chart(
+                                labels,
+                                tuple(table['During Lift %']),
+                                tuple(table['Post Lift %']),
+                                tuple(table['ROI %'])
+                            ),
+                            use_container_width=True
+                        )
+                
+                selected_rows = selection.selection.rows
+                a = analysis_store.get(table.index[selected_rows[0]]) if selected_rows else None
+                if a is not None:
+                    st.markdown(f"### {a['retailer']} • {a['product_group_display']} • {a['periods']['promo_start'].strftime('%b %d')} - {a['periods']['promo_end'].strftime('%b %d, %Y')}")
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        baseline_title, baseline_span = baseline_label(a)
+                        st.markdown(f"**{baseline_title}**")
+                        st.write(f"Sales: ${a['pre_sales']:,.0f}")
+                        st.caption(baseline_span)
+                        st.write(f"Units: {a['pre_units']:,.0f}")
                     
-                    with st.expander(f"**{a['retailer']}** • {product_display} • {a['periods']['promo_start'].strftime('%b %d')} - {a['periods']['promo_end'].strftime('%b %d, %Y')}"):
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.markdown("**Pre-Promo**")
-                            st.write(f"Sales: ${a['pre_sales']:,.0f}")
-                            st.caption("Baseline period")
-                            st.write(f"Units: {a['pre_units']:,.0f}")
-                        
-                        with col2:
-                            st.markdown("**During Promo**")
-                            st.write(f"Sales: ${a['promo_sales']:,.0f}")
-                            st.caption(f"Incremental: ${a['promo_sales'] - a['pre_sales']:,.0f}")
-                            st.write(f"Units: {a['promo_units']:,.0f}")
-                            st.write(f"Lift: {a['metrics']['during_lift']:.1f}%")
-                        
-                        with col3:
-                            st.markdown("**Post-Promo**")
-                            st.write(f"Sales: ${a['post_sales']:,.0f}")
-                            st.caption(f"Incremental: ${a['post_sales'] - a['pre_sales']:,.0f}")
-                            st.write(f"Units: {a['post_units']:,.0f}")
-                            st.write(f"Lift: {a['metrics']['post_lift']:.1f}%")
-                        
+                    with col2:
+                        st.markdown("**During Promo**")
+                        st.write(f"Sales: ${a['promo_sales']:,.0f}")
+                        st.caption(f"Incremental: ${a['promo_sales'] - a['pre_sales']:,.0f}")
+                        st.write(f"Units: {a['promo_units']:,.0f}")
+                        st.write(f"Lift: {a['metrics']['during_lift']:.1f}%")
+                    
+                    with col3:
+                        st.markdown("**Post-Promo**")
+                        st.write(f"Sales: ${a['post_sales']:,.0f}")
+                        st.caption(f"Incremental: ${a['post_sales'] - a['pre_sales']:,.0f}")
+                        st.write(f"Units: {a['post_units']:,.0f}")
+                        st.write(f"Lift: {a['metrics']['post_lift']:.1f}%")
+                    
+                    st.markdown("---")
+                    st.markdown("**Financial Performance**")
+                    perf_col1, perf_col2 = st.columns(2)
+                    with perf_col1:
+                        st.write(f"Gross Margin: {a['gross_margin_pct']:.0f}%")
+                        st.write(f"Expected Lift: {a['expected_lift']:.1f}%")
+                        st.write(f"Expected ROI: {a['expected_roi']:.1f}%")
+                        if a['metrics']['edlp_spend'] > 0:
+                            st.write(f"EDLP Spend: ${a['metrics']['edlp_spend']:,.0f}")
+                    with perf_col2:
+                        st.write(f"Actual ROI: {a['metrics']['roi']:.1f}%")
+                        st.write(f"Incremental Sales: ${a['metrics']['incremental_sales']:,.0f}")
+                        st.write(f"Incremental Profit: ${a['metrics']['incremental_profit']:,.0f}")
+                    
+                    if a.get('notes'):
                         st.markdown("---")
-                        st.markdown("**Financial Performance**")
-                        perf_col1, perf_col2 = st.columns(2)
-                        with perf_col1:
-                            st.write(f"Gross Margin: {a['gross_margin_pct']:.0f}%")
-                            st.write(f"Expected Lift: {a['expected_lift']:.1f}%")
-                            st.write(f"Expected ROI: {a['expected_roi']:.1f}%")
-                            if a['metrics']['edlp_spend'] > 0:
-                                st.write(f"EDLP Spend: ${a['metrics']['edlp_spend']:,.0f}")
-                        with perf_col2:
-                            st.write(f"Actual ROI: {a['metrics']['roi']:.1f}%")
-                            st.write(f"Incremental Sales: ${a['metrics']['incremental_sales']:,.0f}")
-                            st.write(f"Incremental Profit: ${a['metrics']['incremental_profit']:,.0f}")
-                        
-                        if a.get('notes'):
-                            st.markdown("---")
-                            st.markdown("**Notes:**")
-                            st.write(a['notes'])
-                        
-                        if st.button(f"🗑️ Delete Analysis", key=f"del_{idx}"):
-                            st.session_state.promo_analyses.pop(idx)
-                            st.rerun()
+                        st.markdown("**Notes:**")
+                        st.write(a['notes'])
+                    
+                    if st.button(f"🗑️ Delete Analysis", key=f"del_{a['id']}"):
+                        analysis_store.delete(a['id'])
+                        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,35 @@
+"""Small deterministic weekly sales data shared by the tests"""
+import numpy as np
+import pandas as pd
+import pytest
+
+SERIES = [
+    ('AC - ALBERTSONSCO ACME - RMA', '10oz Core'),
+    ('AC - ALBERTSONSCO ACME - RMA', '4pk Core'),
+    ('AC - ALBERTSONSCO SOUTHERN CALIFORNIA DIV - RMA', '10oz Core'),
+    ('AC - ALBERTSONSCO SOUTHERN CALIFORNIA DIV - RMA', '16oz Core'),
+]
+FIRST_WEEK = '2023-01-07'
+WEEKS = 60
+UPCS = 2
+
+def make_weekly_data(seed=0):
+    """Saturday weeks for every SERIES and UPC, in shuffled row order"""
+    rng = np.random.default_rng(seed)
+    week_endings = pd.date_range(FIRST_WEEK, periods=WEEKS, freq='7D')
+    df = pd.DataFrame(
+        [
+            (retailer, product_group, f"UPC{number}{upc}", week)
+            for number, (retailer, product_group) in enumerate(SERIES)
+            for upc in range(UPCS)
+            for week in week_endings
+        ],
+        columns=['GEOGRAPHY', 'Product Group', 'UPC', 'Week Ending']
+    )
+    df['Units'] = rng.integers(50, 150, len(df)).astype('float64')
+    df['Dollars'] = (df['Units'] * rng.uniform(2.5, 5.0, len(df))).round(2)
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+@pytest.fixture
+def weekly_data():
+    return make_weekly_data()
@@ -0,0 +1,63 @@
+"""Saving analyses and keeping the portfolio rollup in step"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ppa_engine import AnalysisStore, SalesIndex, run_analysis
+
+from .conftest import SERIES
+
+PROMO_START = pd.Timestamp('2023-03-05')
+PROMO_END = pd.Timestamp('2023-03-18')
+
+def analyze(weekly, trade_spend=5000.0):
+    retailer, product_group = SERIES[0]
+    return run_analysis(SalesIndex.from_frame(weekly), retailer, [product_group], PROMO_START, PROMO_END, trade_spend, 0.0, 35.0)
+
+def blank_promo_week(weekly, columns=('Dollars',)):
+    retailer, product_group = SERIES[0]
+    promo_week = (weekly['GEOGRAPHY'] == retailer) & (weekly['Product Group'] == product_group) & (weekly['Week Ending'] == '2023-03-11')
+    weekly = weekly.copy()
+    weekly.loc[promo_week, list(columns)] = np.nan
+    return weekly
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalysisStore(tmp_path / 'analyses.sqlite')
+
+def test_save_and_delete_adjust_rollup(store, weekly_data):
+    analysis = analyze(weekly_data)
+    analysis_id = store.save(analysis)
+
+    assert len(store.rollup('Retailer')) == 1
+    assert store.get(analysis_id)['metrics']['incremental_sales'] == pytest.approx(analysis['metrics']['incremental_sales'])
+
+    assert store.delete(analysis_id)
+    assert store.rollup('Retailer').empty
+
+def test_nan_metrics_save_and_count_as_zero_in_rollup(store, weekly_data):
+    analysis = analyze(blank_promo_week(weekly_data))
+    assert math.isnan(analysis['metrics']['incremental_sales'])
+
+    analysis_id = store.save(analysis)
+    assert store.count() == 1
+    assert store.rollup('Retailer')['Incremental Sales'].iloc[0] == 0
+
+    store.rebuild_rollup()
+    assert store.rollup('Retailer')['Incremental Sales'].iloc[0] == 0
+    assert store.delete(analysis_id)
+    assert store.rollup('Retailer').empty
+
+def test_rollup_averages_match_summary(store, weekly_data):
+    blank_dollars = analyze(blank_promo_week(weekly_data, ('Dollars',)))
+    blank_units = analyze(blank_promo_week(weekly_data, ('Units',)))
+    assert math.isnan(blank_dollars['metrics']['roi']) and math.isnan(blank_units['metrics']['during_lift'])
+    store.save_many([blank_dollars, blank_units, analyze(weekly_data, trade_spend=2000.0)])
+
+    rollup = store.rollup('Retailer').iloc[0]
+    summary = store.summary()
+    assert rollup['Analyses'] == summary['count'] == 3
+    assert rollup['Avg Lift %'] == pytest.approx(summary['avg_lift'])
+    assert rollup['Avg ROI %'] == pytest.approx(summary['avg_roi'])
@@ -0,0 +1,56 @@
+"""Smoke test: upload a weekly sales file through the Streamlit app"""
+import io
+import shutil
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest
+
+from ppa_engine import analysis_store, ingest, read_store_manifest
+
+from .conftest import make_weekly_data
+
+APP_PATH = Path(__file__).resolve().parents[1] / 'ppa_sl_ux.py'
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def weekly_upload():
+    weekly = make_weekly_data()
+    buffer = io.BytesIO()
+    weekly.to_excel(buffer, index=False)
+    return ('weekly.xlsx', buffer.getvalue(), XLSX_MIME), len(weekly)
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    cache = ingest.IngestCache(tmp_path / 'cache', ingest.INGEST_CACHE_MEMORY_ENTRIES, ingest.INGEST_CACHE_DISK_ENTRIES)
+    monkeypatch.setattr(ingest, 'get_ingest_cache', lambda: cache)
+    monkeypatch.setattr(analysis_store, 'ANALYSIS_DB_PATH', tmp_path / 'analyses.sqlite')
+    return AppTest.from_file(str(APP_PATH), default_timeout=60)
+
+def test_upload_loads_weekly_store(app):
+    upload, rows = weekly_upload()
+    app.run()
+    assert app.session_state.weekly_store is None
+
+    app.sidebar.file_uploader[0].set_value(upload).run()
+
+    assert not app.exception
+    assert not app.error
+    assert app.session_state.weekly_store is not None
+    assert read_store_manifest(app.session_state.weekly_store)['rows'] == rows
+    assert any(f'{rows:,} rows loaded' in message.value for message in app.sidebar.success)
+
+def test_evicted_store_is_reloaded_from_upload(app):
+    upload, rows = weekly_upload()
+    app.run()
+    app.sidebar.file_uploader[0].set_value(upload).run()
+    store_dir = app.session_state.weekly_store
+    shutil.rmtree(store_dir)
+
+    app.run()
+
+    assert not app.exception
+    assert app.session_state.weekly_store == store_dir
+    assert read_store_manifest(store_dir)['rows'] == rows
+    assert any('expired' in message.value for message in app.sidebar.warning)
@@ -0,0 +1,55 @@
+"""Batch evaluation: serial, process pool and single-analysis agreement"""
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ppa_engine import SalesIndex, read_promo_calendar, run_analysis, run_promo_batch, run_promo_batch_parallel, write_weekly_store
+
+from .conftest import FIRST_WEEK, SERIES
+
+def read_calendar(calendar):
+    return read_promo_calendar(io.StringIO(calendar.to_csv(index=False)), 'calendar.csv')
+
+def promo_calendar(count, seed=0):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(SERIES), count)
+    starts = pd.Timestamp(FIRST_WEEK) + pd.to_timedelta(rng.integers(30, 350, count), unit='D')
+    return read_calendar(pd.DataFrame({
+        'Retailer': [SERIES[i][0] for i in picks],
+        'Product Group(s)': [SERIES[i][1] for i in picks],
+        'Promo Start': starts,
+        'Promo End': starts + pd.to_timedelta(rng.integers(6, 28, count), unit='D'),
+        'Trade Spend': rng.uniform(500, 5000, count).round(2)
+    }))
+
+def test_parallel_batch_matches_serial(tmp_path, weekly_data):
+    calendar = promo_calendar(40)
+    write_weekly_store(weekly_data, tmp_path / 'store')
+
+    serial = run_promo_batch(SalesIndex.from_frame(weekly_data), calendar)
+    parallel = run_promo_batch_parallel(tmp_path / 'store', calendar, max_workers=2)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+
+def test_blank_week_matches_single_analysis(weekly_data):
+    retailer, product_group = SERIES[0]
+    start, end = pd.Timestamp('2023-03-05'), pd.Timestamp('2023-03-18')
+    blank = (weekly_data['GEOGRAPHY'] == retailer) & (weekly_data['Product Group'] == product_group) & (weekly_data['Week Ending'] == '2023-03-11')
+    weekly_data.loc[blank.idxmax(), 'Dollars'] = np.nan
+    sales_index = SalesIndex.from_frame(weekly_data)
+    calendar = read_calendar(pd.DataFrame({
+        'Retailer': [retailer], 'Product Group(s)': [product_group],
+        'Promo Start': [start], 'Promo End': [end], 'Trade Spend': [1000.0]
+    }))
+
+    row = run_promo_batch(sales_index, calendar).iloc[0]
+    analysis = run_analysis(sales_index, retailer, [product_group], start, end, 1000.0, 0.0, 30.0)
+
+    assert row['Issue'] == ''
+    assert math.isnan(row['During Promo Sales']) and math.isnan(analysis['promo_sales'])
+    assert math.isnan(row['Incremental Sales']) and math.isnan(analysis['metrics']['incremental_sales'])
+    assert row['During Promo Units'] == pytest.approx(analysis['promo_units'])
+    assert row['Actual During Lift %'] == pytest.approx(analysis['metrics']['during_lift'])
@@ -0,0 +1,54 @@
+"""Promo detection and trailing baselines across retailers' week-ending days"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ppa_engine import SalesIndex, detect_promo_windows, weekly_matrix
+
+SPIKE_WEEKS = [20, 21, 22]
+
+def weekly_rows(retailer, first_week, weeks=40, spike_weeks=()):
+    week_endings = pd.date_range(first_week, periods=weeks, freq='7D')
+    units = np.full(weeks, 100.0)
+    units[list(spike_weeks)] = 200.0
+    return pd.DataFrame({
+        'GEOGRAPHY': retailer,
+        'Product Group': 'COCONUT WATER',
+        'Week Ending': week_endings,
+        'Dollars': units * 3.0,
+        'Units': units
+    })
+
+def saturday_feed():
+    return weekly_rows('SATURDAY MARKET - RMA', '2023-01-07', spike_weeks=SPIKE_WEEKS)
+
+def sunday_feed():
+    return weekly_rows('SUNDAY MARKET - RMA', '2023-01-08')
+
+def test_spike_is_one_window():
+    detected = detect_promo_windows(SalesIndex.from_frame(saturday_feed()))
+    assert len(detected) == 1
+    assert detected['Weeks'].iloc[0] == 3
+
+@pytest.mark.parametrize('first_week', ['2023-01-08', '2023-01-04', '2023-01-10'])
+def test_other_weekday_feeds_do_not_split_windows(first_week):
+    other = weekly_rows('OTHER MARKET - RMA', first_week)
+    alone = detect_promo_windows(SalesIndex.from_frame(saturday_feed()))
+    mixed = detect_promo_windows(SalesIndex.from_frame(pd.concat([saturday_feed(), other], ignore_index=True)))
+    pd.testing.assert_frame_equal(mixed, alone)
+
+def test_weekly_matrix_keeps_each_series_contiguous():
+    keys, week_axis, matrix = weekly_matrix(SalesIndex.from_frame(pd.concat([saturday_feed(), sunday_feed()], ignore_index=True)))
+    assert matrix.shape == (2, 40)
+    assert not np.isnan(matrix).any()
+    for row, (retailer, _) in enumerate(keys):
+        weekday = 5 if retailer.startswith('SATURDAY') else 6
+        assert (pd.DatetimeIndex(week_axis[row]).weekday == weekday).all()
+
+def test_trailing_median_ignores_other_weekday_feeds():
+    retailer = 'SATURDAY MARKET - RMA'
+    start, end = pd.Timestamp('2023-05-21'), pd.Timestamp('2023-06-10')
+    mixed = SalesIndex.from_frame(pd.concat([saturday_feed(), sunday_feed()], ignore_index=True))
+    dollars, units = mixed.baselines().baseline_sales(retailer, ['COCONUT WATER'], [start], [end], 'trailing_median', 4)
+    assert units[0] == pytest.approx(300.0)
+    assert dollars[0] == pytest.approx(900.0)
@@ -0,0 +1,54 @@
+"""EDLP rate table: as-of pricing and unreadable tables"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ppa_engine import SalesIndex, edlp_spend_windows, load_edlp_rates, read_edlp_rates
+
+from .conftest import FIRST_WEEK, SERIES
+
+RATE_CHANGE = pd.Timestamp(FIRST_WEEK) + pd.Timedelta(weeks=20)
+
+@pytest.fixture
+def rates(tmp_path):
+    retailer, product_group = SERIES[0]
+    pd.DataFrame({
+        'Retailer': [retailer, retailer],
+        'Product Group': [product_group, product_group],
+        'Rate': [0.5, 1.25],
+        'Effective From': [None, RATE_CHANGE],
+        'Effective To': [RATE_CHANGE - pd.Timedelta(days=1), None]
+    }).to_csv(tmp_path / 'rates.csv', index=False)
+    return read_edlp_rates(tmp_path / 'rates.csv')
+
+def test_rate_change_mid_window(weekly_data, rates):
+    retailer, product_group = SERIES[0]
+    sales_index = SalesIndex.from_frame(weekly_data)
+    start, end = RATE_CHANGE - pd.Timedelta(days=17), RATE_CHANGE + pd.Timedelta(days=11)
+
+    # RATE_CHANGE is a Week Ending, so its whole week is priced at the new rate
+    _, old_units = sales_index.period_sales(retailer, [product_group], start, RATE_CHANGE - pd.Timedelta(days=7))
+    _, new_units = sales_index.period_sales(retailer, [product_group], RATE_CHANGE - pd.Timedelta(days=6), end)
+    spend = edlp_spend_windows(sales_index, [retailer], [[product_group]], [start], [end], rates)
+
+    assert spend[0] == pytest.approx(0.5 * old_units + 1.25 * new_units)
+    assert old_units > 0 and new_units > 0
+
+def test_blank_units_week_makes_spend_nan(weekly_data, rates):
+    retailer, product_group = SERIES[0]
+    week = RATE_CHANGE + pd.Timedelta(weeks=1)
+    blank = (weekly_data['GEOGRAPHY'] == retailer) & (weekly_data['Product Group'] == product_group) & (weekly_data['Week Ending'] == week)
+    weekly_data.loc[blank.idxmax(), 'Units'] = np.nan
+    spend = edlp_spend_windows(
+        SalesIndex.from_frame(weekly_data), [retailer, retailer], [[product_group], [product_group]],
+        [week - pd.Timedelta(days=3), week + pd.Timedelta(days=1)], [week + pd.Timedelta(days=3), week + pd.Timedelta(days=14)], rates
+    )
+    assert np.isnan(spend[0])
+    assert spend[1] > 0
+
+def test_unreadable_rate_table_raises_value_error(tmp_path):
+    with pytest.raises(ValueError, match='Cannot read EDLP rate table'):
+        load_edlp_rates(tmp_path / 'missing.csv')
+    (tmp_path / 'bad.csv').write_text("Retailer,Product Group\nX,Y\n")
+    with pytest.raises(ValueError, match='missing column'):
+        load_edlp_rates(tmp_path / 'bad.csv')
@@ -0,0 +1,45 @@
+"""Appending weekly deltas to a stored dataset"""
+import pandas as pd
+import pytest
+
+from ppa_engine import IngestCache, append_weekly_data, get_sales_index, ingest_weekly_data, read_weekly_store
+
+from .conftest import FIRST_WEEK, SERIES
+
+NEW_RETAILER = 'AC - ALBERTSONSCO SHAWS DIV W/ STAR MARKET - RMA'
+
+@pytest.fixture
+def cache(tmp_path):
+    return IngestCache(tmp_path / 'cache', 2, 16)
+
+def weekly_totals(df):
+    """Dollars and Units per (GEOGRAPHY, Product Group, Week Ending)"""
+    df = df.assign(**{col: df[col].astype(str) for col in ('GEOGRAPHY', 'Product Group')})
+    return df.groupby(['GEOGRAPHY', 'Product Group', 'Week Ending'])[['Dollars', 'Units']].sum().astype('float64')
+
+def test_append_takes_last_write_and_adds_retailers(tmp_path, cache, weekly_data):
+    weekly_data.to_csv(tmp_path / 'weekly.csv', index=False)
+    store_dir = ingest_weekly_data(tmp_path / 'weekly.csv', cache)
+    get_sales_index(store_dir)
+
+    retailer, product_group = SERIES[0]
+    week = pd.Timestamp(FIRST_WEEK) + pd.Timedelta(weeks=5)
+    delta = pd.DataFrame({
+        'GEOGRAPHY': [retailer, NEW_RETAILER],
+        'Product Group': [product_group, '16oz Core'],
+        'UPC': ['UPC-REDELIVERED', 'UPC-NEW'],
+        'Week Ending': [week, week],
+        'Units': [999.0, 10.0],
+        'Dollars': [2997.0, 30.0]
+    })
+    delta.to_csv(tmp_path / 'delta.csv', index=False)
+    appended = append_weekly_data(store_dir, tmp_path / 'delta.csv', cache)
+
+    replaced = (weekly_data['GEOGRAPHY'] == retailer) & (weekly_data['Product Group'] == product_group) & (weekly_data['Week Ending'] == week)
+    expected = weekly_totals(pd.concat([weekly_data[~replaced], delta], ignore_index=True))
+    pd.testing.assert_frame_equal(weekly_totals(read_weekly_store(appended)), expected)
+
+    sales_index = get_sales_index(appended)
+    assert sales_index.retailers() == sorted({retailer for retailer, _ in SERIES} | {NEW_RETAILER})
+    assert sales_index.period_sales(retailer, [product_group], week - pd.Timedelta(days=6), week) == pytest.approx((2997.0, 999.0))
+    assert sales_index.period_sales(NEW_RETAILER, ['16oz Core'], week - pd.Timedelta(days=6), week) == pytest.approx((30.0, 10.0))
@@ -0,0 +1,82 @@
+"""Prorated window sales: frame, index and cube paths against the original loop"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ppa_engine import SalesIndex, get_period_sales, get_windows_sales
+
+from .conftest import FIRST_WEEK, SERIES
+
+def iterrows_period_sales(df, retailer, product_groups, start_date, end_date):
+    """The app's original row-by-row proration"""
+    filtered_df = df[(df['GEOGRAPHY'] == retailer) & (df['Product Group'].isin(product_groups))]
+    period_data = filtered_df[
+        (filtered_df['Week Ending'] >= start_date) &
+        (filtered_df['Week Ending'] <= end_date + timedelta(days=7))
+    ]
+    total_dollars = 0
+    total_units = 0
+    for _, row in period_data.iterrows():
+        week_end = row['Week Ending']
+        overlap_start = max(week_end - timedelta(days=6), start_date)
+        overlap_end = min(week_end, end_date)
+        if overlap_start <= overlap_end:
+            proration_factor = ((overlap_end - overlap_start).days + 1) / 7.0
+            total_dollars += row['Dollars'] * proration_factor
+            total_units += row['Units'] * proration_factor
+    return total_dollars, total_units
+
+def random_windows(count, seed=0):
+    """(retailer, product groups, start, end) with partial weeks and multi-group selections"""
+    rng = np.random.default_rng(seed)
+    windows = []
+    for _ in range(count):
+        retailer = SERIES[rng.integers(len(SERIES))][0]
+        groups = [group for name, group in SERIES if name == retailer]
+        groups = groups[:rng.integers(1, len(groups) + 1)]
+        start = pd.Timestamp(FIRST_WEEK) + pd.Timedelta(days=int(rng.integers(-14, 400)))
+        end = start + pd.Timedelta(days=int(rng.integers(0, 40)))
+        windows.append((retailer, groups, start, end))
+    return windows
+
+def test_period_sales_match_iterrows(weekly_data):
+    for retailer, groups, start, end in random_windows(50):
+        expected = iterrows_period_sales(weekly_data, retailer, groups, start, end)
+        assert get_period_sales(weekly_data, retailer, groups, start, end, (end - start).days + 1) == expected
+
+def test_windows_sales_match_period_sales(weekly_data):
+    retailer, groups, _, _ = random_windows(1)[0]
+    windows = [(start, end) for _, _, start, end in random_windows(20, seed=1)]
+    expected = [get_period_sales(weekly_data, retailer, groups, start, end, (end - start).days + 1) for start, end in windows]
+    assert get_windows_sales(weekly_data, retailer, groups, windows) == expected
+
+def test_index_matches_frame(weekly_data):
+    sales_index = SalesIndex.from_frame(weekly_data)
+    for retailer, groups, start, end in random_windows(50):
+        assert sales_index.window_sales(retailer, groups, [(start, end)]) == get_windows_sales(weekly_data, retailer, groups, [(start, end)])
+
+def test_cube_matches_index(weekly_data):
+    sales_index = SalesIndex.from_frame(weekly_data)
+    cube = sales_index.cube()
+    for retailer, groups, start, end in random_windows(50):
+        (dollars, units), = sales_index.window_sales(retailer, groups, [(start, end)])
+        cube_dollars, cube_units = cube.window_sales_arrays(retailer, groups, [start], [end])
+        assert cube_dollars[0] == pytest.approx(dollars, rel=1e-9, abs=1e-6)
+        assert cube_units[0] == pytest.approx(units, rel=1e-9, abs=1e-6)
+
+def test_blank_week_is_nan_on_every_path(weekly_data):
+    retailer, product_group = SERIES[0]
+    blank_week = pd.Timestamp(FIRST_WEEK) + pd.Timedelta(weeks=10)
+    blank = (weekly_data['GEOGRAPHY'] == retailer) & (weekly_data['Product Group'] == product_group) & (weekly_data['Week Ending'] == blank_week)
+    weekly_data.loc[blank.idxmax(), 'Dollars'] = np.nan
+    sales_index = SalesIndex.from_frame(weekly_data)
+    touching = (blank_week - pd.Timedelta(days=2), blank_week + pd.Timedelta(days=10))
+    clear = (blank_week + pd.Timedelta(days=1), blank_week + pd.Timedelta(days=20))
+
+    (dollars, units), (clear_dollars, _) = sales_index.window_sales(retailer, [product_group], [touching, clear])
+    cube_dollars, cube_units = sales_index.cube().window_sales_arrays(retailer, [product_group], [touching[0], clear[0]], [touching[1], clear[1]])
+    assert np.isnan(dollars) and np.isnan(cube_dollars[0])
+    assert cube_units[0] == pytest.approx(units)
+    assert cube_dollars[1] == pytest.approx(clear_dollars)